@@ -1711,6 +1711,13 @@ def process_argv(argv):
 # --------
 # Commands
 # --------
+def find_input_value(etree,input_id):
+    # let ElementTree's path predicate find the input instead of walking every input in python
+    elm = etree.find(".//input[@id='%s']" % input_id)
+    if elm is None:
+        return None
+    return elm.attrib.get('value')
+
 def cmd_login(user, passwd):
     """Attempts to log into GOG Galaxy API and saves the resulting Token to disk.
     """
@@ -1773,10 +1780,9 @@ def cmd_login(user, passwd):
         except Exception:
             error("Could not parse entered URL. Try again later or report to the maintainer")
             return 
-    for elm in etree.findall('.//input'):
-        if elm.attrib['id'] == 'login__token':
-            token_data['login_token'] = elm.attrib['value']
-            break
+    login_token = find_input_value(etree,'login__token')
+    if login_token is not None:
+        token_data['login_token'] = login_token
             
     if not token_data['login_code']:        
 
@@ -1788,16 +1794,14 @@ def cmd_login(user, passwd):
         etree = html5lib.parse(page_response.text, namespaceHTMLElements=False)
         if 'totp' in page_response.url:
             token_data['totp_url'] = page_response.url
-            for elm in etree.findall('.//input'):
-                if elm.attrib['id'] == 'two_factor_totp_authentication__token':
-                    token_data['totp_token'] = elm.attrib['value']
-                    break
+            totp_token = find_input_value(etree,'two_factor_totp_authentication__token')
+            if totp_token is not None:
+                token_data['totp_token'] = totp_token
         elif 'two_step' in page_response.url:
             token_data['two_step_url'] = page_response.url
-            for elm in etree.findall('.//input'):
-                if elm.attrib['id'] == 'second_step_authentication__token':
-                    token_data['two_step_token'] = elm.attrib['value']
-                    break
+            two_step_token = find_input_value(etree,'second_step_authentication__token')
+            if two_step_token is not None:
+                token_data['two_step_token'] = two_step_token
         elif 'on_login_success' in page_response.url:
             parsed = urlparse(page_response.url)    
             query_parsed = parse_qs(parsed.query)
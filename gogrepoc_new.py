@@ -217,27 +217,11 @@ def add_verify_command(subparsers):
         'verify',
         help='Scan and verify downloaded GOG files (size, MD5, zip integrity)',
         description='Verify integrity of downloaded files by checking file size, MD5 checksums, '
-                    'and zip file integrity. Failed files can be deleted (-delete) or cleaned (-clean).'
+                    'and zip file integrity.'
     )
     parser.add_argument('gamedir', action='store', help='directory containing games to verify', nargs='?', default=GAME_STORAGE_DIR)
-    parser.add_argument('-permissivechangeclear', action='store_true', help='clear change marking for files that pass test')
+    parser.add_argument('-incremental', action='store_true', help='skip files that passed a previous incremental verification and are unchanged since (same size and mtime)')
     parser.add_argument('-forceverify', action='store_true', help='verify files unchanged since last verification')
-    parser.add_argument('-skipmd5', action='store_true', help='do not perform MD5 check')
-    parser.add_argument('-skipsize', action='store_true', help='do not perform size check')
-    parser.add_argument('-skipzip', action='store_true', help='do not perform zip integrity check')
-    g2 = parser.add_mutually_exclusive_group()
-    g2.add_argument('-delete', action='store_true', help='delete any files which fail integrity test')
-    g2.add_argument('-noclean', action='store_true', help='leave any files which fail integrity test in place')
-    g2.add_argument('-clean', action='store_true', help='(deprecated) default behaviour')
-    g3 = add_id_filters(parser)
-    g3.add_argument('-id', action='store', help='(deprecated) id or title of game to verify')
-    parser.add_argument('-skipfiles', action='store', help='file name (or glob patterns) to NOT verify', nargs='*', default=[])
-    add_os_filters(parser)
-    add_lang_filters(parser)
-    g6 = parser.add_mutually_exclusive_group()
-    g6.add_argument('-skipextras', action='store_true', help='skip verification of any GOG extra files')
-    g6.add_argument('-skipgames', action='store_true', help='skip verification of any GOG game files')
-    add_installer_type_flags(parser)
     add_common_flags(parser)
 
 def add_clean_command(subparsers):
@@ -401,7 +385,7 @@ For detailed help on a specific command:
     if not args.debug:     
         rootLogger.setLevel(logging.INFO)
 
-    if args.command == 'update' or args.command == 'download' or args.command == 'backup' or args.command == 'import' or args.command == 'verify':
+    if args.command == 'update' or args.command == 'download' or args.command == 'backup' or args.command == 'import':
         for lang in args.lang+args.skiplang:  # validate the language
             if lang not in VALID_LANG_TYPES:
                 error('error: specified language "%s" is not one of the valid languages %s' % (lang, VALID_LANG_TYPES))
@@ -482,29 +466,7 @@ def main(args):
             args.skipshared = True
         cmd_import(args.src_dir, args.dest_dir, args.os, args.lang, args.skipextras, args.skipids, args.ids, args.skipgalaxy, args.skipstandalone, args.skipshared, False)
     elif args.command == 'verify':
-        #Hardcode these as false since extras currently do not have MD5s as such skipgames would give nothing and skipextras would change nothing. The logic path and arguments are present in case this changes, though commented out in the case of arguments)
-        if args.clean:
-            warn("The -clean option is deprecated, as the default behaviour has been changed to clean files that fail the verification checks. -noclean now exists for leaving files in place. Please update your scripts accordingly. ")
-        if (args.id):
-            args.ids = [args.id]    
-        if not args.os:    
-            if args.skipos:
-                args.os = [x for x in VALID_OS_TYPES if x not in args.skipos]
-            else:
-                args.os = VALID_OS_TYPES
-        if not args.lang:    
-            if args.skiplang:
-                args.lang = [x for x in VALID_LANG_TYPES if x not in args.skiplang]
-            else:
-                args.lang = VALID_LANG_TYPES
-        if args.skipgames:
-            args.skipstandalone = True
-            args.skipgalaxy = True
-            args.skipshared = True                
-        check_md5 = not args.skipmd5
-        check_filesize = not args.skipsize
-        check_zips = not args.skipzip
-        cmd_verify(args.gamedir, args.skipextras,args.skipids,check_md5, check_filesize, check_zips, args.delete,not args.noclean,args.ids,  args.os, args.lang,args.skipgalaxy,args.skipstandalone,args.skipshared, args.skipfiles, args.forceverify,args.permissivechangeclear)
+        cmd_verify(args.gamedir, incremental=args.incremental, force_verify=args.forceverify)
     elif args.command == 'backup':
         if not args.os:    
             if args.skipos:
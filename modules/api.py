@@ -9,15 +9,15 @@ import logging
 import getpass
 import json
 import requests
-import html5lib
 import xml.etree.ElementTree
 import email.utils
 import threading
+from collections import OrderedDict
 from urllib.parse import urlparse, unquote, urlunparse, parse_qs
 
 from .utils import (
-    AttrDict, info, warn, error, debug, log_exception,
-    HTTP_TIMEOUT, HTTP_RETRY_COUNT, HTTP_RETRY_DELAY, USER_AGENT,
+    AttrDict, info, warn, error, debug, log_exception, response_json,
+    HTTP_TIMEOUT, HTTP_RETRY_COUNT, HTTP_RETRY_DELAY, USER_AGENT, RESPONSE_CACHE_SIZE,
     TOKEN_FILENAME, SKIP_MD5_FILE_EXT,
     GOG_HOME_URL, GOG_AUTH_URL, GOG_LOGIN_URL, GOG_TOKEN_URL,
     GOG_GALAXY_REDIRECT_URL, GOG_CLIENT_ID, GOG_SECRET,
@@ -125,6 +125,10 @@ def renew_token(session, retries=HTTP_RETRY_COUNT, delay=None):
     Returns:
         bool: True if token was renewed successfully, False otherwise
     """
+    # Most calls find the token still fresh, answer those without queueing on the lock
+    token = getattr(session, 'token', None)
+    if isinstance(token, dict) and int(time.time()) + 300 <= token.get('expiry', 0):
+        return False
     with token_lock:
         time_now = int(time.time())
         try:
@@ -142,7 +146,7 @@ def renew_token(session, retries=HTTP_RETRY_COUNT, delay=None):
                         },
                         timeout=HTTP_TIMEOUT
                     )
-                    token_json = token_response.json()
+                    token_json = response_json(token_response)
                     
                     if token_response.status_code != 200:
                         if retries > 0:
@@ -306,10 +310,34 @@ def fetch_chunk_tree(response, session):
             return None 
     return None
 
+def cached_request(session, url, fetch=request):
+    """Issue ``fetch(session, url)`` once per update run and reuse the result afterwards.
+
+    Downloads shared between games, DLCs and OS variants point at the same URLs, so
+    an update would otherwise ask GOG about them again for every listing. Only the
+    final url, the headers and the body are kept, for the last RESPONSE_CACHE_SIZE
+    requests, on the session until clear_response_cache(). Not thread safe, the
+    update does its lookups from one thread.
+    """
+    cache = session.__dict__.setdefault('response_cache', OrderedDict())
+    key = (fetch.__name__, url)
+    if key in cache:
+        cache.move_to_end(key)
+    else:
+        response = fetch(session, url)
+        cache[key] = AttrDict(url=response.url, headers=response.headers, content=response.content, text=response.text)
+        if len(cache) > RESPONSE_CACHE_SIZE:
+            cache.popitem(last=False)
+    return cache[key]
+
+def clear_response_cache(session):
+    """Forget what cached_request() kept for session, once an update run is done."""
+    session.__dict__.pop('response_cache', None)
+
 def fetch_file_info(d, fetch_md5, save_md5_xml, updateSession):
    # fetch file name/size
     #try:
-    response= request_head(updateSession, d.href)
+    response= cached_request(updateSession, d.href, request_head)
     #except ContentDecodingError as e:
         #info('decoding failed because getting 0 bytes')
         #response = e.response
@@ -362,7 +390,7 @@ def fetch_file_info(d, fetch_md5, save_md5_xml, updateSession):
         if file_ext not in SKIP_MD5_FILE_EXT:
             try:
                 tmp_md5_url = append_xml_extension_to_url_path(response.url)
-                md5_response = request(updateSession, tmp_md5_url)
+                md5_response = cached_request(updateSession, tmp_md5_url)
                 shelf_etree = xml.etree.ElementTree.fromstring(md5_response.content)
                 d.gog_data.md5_xml = AttrDict()
                 d.gog_data.md5_xml.tag = shelf_etree.tag
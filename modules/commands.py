@@ -4,36 +4,29 @@
 import sys
 import os
 import time
-import webbrowser
 import datetime
 import logging
 import threading
 import shutil
 import zipfile
 import re
-import getpass
-import html5lib
-import xml.etree.ElementTree
 import shelve
 from queue import Queue
-from urllib.parse import urlparse, unquote, urlunparse, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, groupby
+from urllib.parse import urlparse, unquote, unquote_plus, urlunparse
 import ctypes # For wakelock logic if we move it here or keep in utils
 
-try:
-    from html2text import html2text
-except ImportError:
-    def html2text(x): return x
-
 from .utils import (
-    AttrDict, info, warn, error, debug, log_exception,
-    ConditionalWriter, open_notrunc, open_notruncwrrd, hashfile, hashstream, slugify,
+    AttrDict, BufferedShelf, CancellingThreadPoolExecutor, bounded_map, tqdm, info, warn, error, debug, log_exception, response_json, decode_serial,
+    ConditionalWriter, open_notrunc, open_notruncwrrd, hashfile, hashstream, get_md5_xattr, set_md5_xattr, slugify,
     check_skip_file, process_path, is_numeric_id, get_fs_type, test_zipfile,
-    move_with_increment_on_clash, pretty_size, get_total_size, build_md5_lookup,
-    HTTP_RETRY_DELAY, HTTP_GAME_DOWNLOADER_THREADS, HTTP_TIMEOUT,
+    move_with_increment_on_clash, fast_move, fast_copy, pretty_size, get_total_size, file_ext, stat_file, dir_file_sizes, iter_files_with_size, build_md5_lookup,
+    HTTP_RETRY_DELAY, HTTP_GAME_DOWNLOADER_THREADS, HTTP_TIMEOUT, DETAIL_LIST_KEYS,
     MANIFEST_FILENAME, RESUME_MANIFEST_FILENAME, CONFIG_FILENAME,
     MD5_DIR_NAME, MD5_DB, DOWNLOADING_DIR_NAME, PROVISIONAL_DIR_NAME,
     ORPHAN_DIR_NAME, IMAGES_DIR_NAME, INFO_FILENAME, SERIAL_FILENAME,
-    GAME_STORAGE_DIR, RESUME_MANIFEST_SYNTAX_VERSION, RESUME_SAVE_THRESHOLD,
+    GAME_STORAGE_DIR, RESUME_MANIFEST_SYNTAX_VERSION, RESUME_SAVE_THRESHOLD, RESUME_SAVE_INTERVAL, HASH_THREADS, DELETE_THREADS,
     GOG_HOME_URL, GOG_LOGIN_URL, GOG_AUTH_URL, GOG_TOKEN_URL,
     GOG_GALAXY_REDIRECT_URL, GOG_CLIENT_ID, GOG_SECRET,
     GOG_MEDIA_TYPE_GAME, GOG_MEDIA_TYPE_MOVIE, GOG_ACCOUNT_URL,
@@ -43,14 +36,16 @@ from .utils import (
 )
 
 from .api import (
-    makeGOGSession, makeGitHubSession, request, request_head, fetch_chunk_tree, save_token, renew_token
+    makeGOGSession, makeGitHubSession, request, request_head, fetch_chunk_tree, save_token, renew_token,
+    clear_response_cache
 )
 
 from .manifest import (
     load_manifest, save_manifest, load_resume_manifest, save_resume_manifest,
-    load_config_file, save_config_file, item_checkdb,
+    load_config_file, save_config_file,
     handle_game_renames, handle_game_updates,
-    filter_downloads, filter_extras, filter_dlcs, deDuplicateList
+    filter_downloads, filter_extras, filter_dlcs, deDuplicateList, registerDeDuplicatedList,
+    index_downloads, in_download_index
 )
 
 from .game_filter import GameFilter
@@ -65,6 +60,23 @@ FILE_BEGIN = 0x0
 
 lock = threading.Lock()
 
+# code parameter in the query or fragment of a pasted redirect URL
+LOGIN_CODE_RE = re.compile(r'[?&#]code=([^&#]+)')
+
+def _extract_login_code(user_input):
+    """Returns the OAuth code from a pasted redirect URL or bare code, or None."""
+    s = (user_input or "").strip()
+    if not s:
+        return None
+    # If they paste just the code, accept it
+    if "://" not in s and "code=" not in s:
+        return s
+    # Otherwise take it from the URL (query before fragment)
+    match = LOGIN_CODE_RE.search(s)
+    if match:
+        return unquote_plus(match.group(1))
+    return None
+
 def cmd_login(user_id=None):
     """Authenticate with GOG using browser-based OAuth2 flow and save the token.
     
@@ -112,30 +124,14 @@ def cmd_login(user_id=None):
     auth_url = page_response.url
     info("Open this URL in your browser to sign in:")
     info(auth_url)
+    import webbrowser # only login needs it
     try:
         webbrowser.open(auth_url)
     except Exception:
         pass
 
-    def _extract_code(user_input: str):
-        s = (user_input or "").strip()
-        if not s:
-            return None
-        # If they paste just the code, accept it
-        if "://" not in s and "code=" not in s:
-            return s
-        # Otherwise parse from URL (query or fragment)
-        parsed = urlparse(s)
-        q = parse_qs(parsed.query)
-        if "code" in q and q["code"]:
-            return q["code"][0]
-        frag = parse_qs(parsed.fragment)
-        if "code" in frag and frag["code"]:
-            return frag["code"][0]
-        return None
-
     pasted = input("After signing in, paste the full redirected URL (or just the code): ").strip()
-    login_code = _extract_code(pasted)
+    login_code = _extract_login_code(pasted)
     if not login_code:
         error("Could not find an authorization code in what you pasted.")
         return
@@ -151,7 +147,7 @@ def cmd_login(user_id=None):
                                      'grant_type': 'authorization_code',
                                      'code': login_code,
                                      'redirect_uri': redirect_uri})
-        token_json = token_response.json()
+        token_json = response_json(token_response)
         token_json['expiry'] = token_start + token_json['expires_in']
         save_token(token_json, user_id=user_id)
         info('Galaxy login successful!')
@@ -184,6 +180,29 @@ def cmd_update_v2(os_list, lang_list, skipknown, updateonly, partial, ids, skipi
         md5xmls: Fetch MD5 checksum XML files
         noChangeLogs: Exclude changelog data from manifest
     """
+    info("Using experimental cmd_update_v2 (modular architecture)")
+    
+    update_args = (os_list, lang_list, skipknown, updateonly, partial, ids, skipids, skipHidden,
+                   installers, resumemode, strict, strictDupe, md5xmls, noChangeLogs)
+    # Finishing a resumed update hands back the originally requested arguments. Run
+    # them here rather than recursing, so the first pass' state can be freed first.
+    # Both passes share one session, and with it its open connections.
+    updateSession = makeGOGSession()
+    try:
+        while update_args is not None:
+            update_args = _cmd_update_v2_pass(updateSession, *update_args)
+    finally:
+        # the HEAD/md5 xml lookups are only worth keeping for the length of the run
+        clear_response_cache(updateSession)
+
+
+def _cmd_update_v2_pass(updateSession, os_list, lang_list, skipknown, updateonly, partial, ids, skipids, skipHidden, 
+                        installers, resumemode, strict, strictDupe, md5xmls, noChangeLogs):
+    """Run a single cmd_update_v2 pass.
+
+    Returns the arguments of the update that still has to run after a resumed
+    update completes, otherwise None.
+    """
     from .update import (
         FetchConfig,
         update_full_library,
@@ -198,8 +217,6 @@ def cmd_update_v2(os_list, lang_list, skipknown, updateonly, partial, ids, skipi
     )
     from .game_filter import GameFilter
     
-    info("Using experimental cmd_update_v2 (modular architecture)")
-    
     # Load existing manifest
     gamesdb = load_manifest()
     
@@ -239,8 +256,7 @@ def cmd_update_v2(os_list, lang_list, skipknown, updateonly, partial, ids, skipi
             skipknown = True
             updateonly = True
         
-        # Create session and renew token
-        updateSession = makeGOGSession()
+        # Renew token if needed
         renew_token(updateSession)
         
         # Create fetch configuration
@@ -254,7 +270,7 @@ def cmd_update_v2(os_list, lang_list, skipknown, updateonly, partial, ids, skipi
         )
         
         # Extract known IDs from existing manifest
-        known_ids = [item.id for item in gamesdb]
+        known_ids = {item.id for item in gamesdb}
         
         # Determine which update strategy to use and fetch games
         if ids:
@@ -313,21 +329,20 @@ def cmd_update_v2(os_list, lang_list, skipknown, updateonly, partial, ids, skipi
             return
     
     # Create/update resume manifest
-    resumedb = sorted(items, key=lambda item: item.title)
+    items.sort(key=lambda item: item.title)
     resumeprop = create_resume_properties(
         FetchConfig(os_list, lang_list, installers, strictDupe, md5xmls, noChangeLogs),
         skipknown, partial, updateonly
     )
     resumeprop['strict'] = strict
-    resumedb.append(resumeprop)
-    save_resume_manifest(resumedb)
+    save_resume_manifest(items + [resumeprop])
     
     # Create GameFilter with strict flag for processing
     processing_filter = GameFilter(strict=strict)
     
     # Process items with strict update checking and resume saves
     gamesdb, global_dupes = process_items_with_resume(
-        items, gamesdb, processing_filter, skipknown, updateonly
+        items, gamesdb, processing_filter, skipknown, updateonly, resumeprop
     )
     
     # Handle game renames (directory and file renames when GOG changes titles)
@@ -340,9 +355,8 @@ def cmd_update_v2(os_list, lang_list, skipknown, updateonly, partial, ids, skipi
     for game in gamesdb:
         handle_single_game_rename(game, gamedir, orphan_root_dir, dryrun=False)
     
-    # Save final manifest in alphabetical order
-    sorted_gamesdb = sorted(gamesdb, key=lambda game: game.title)
-    save_manifest(sorted_gamesdb, update_md5_xml=md5xmls, delete_md5_xml=md5xmls)
+    # Save final manifest, process_items_with_resume already left it in alphabetical order
+    save_manifest(gamesdb, update_md5_xml=md5xmls, delete_md5_xml=md5xmls)
     
     # Mark resume as complete
     resumeprop['complete'] = True
@@ -350,14 +364,15 @@ def cmd_update_v2(os_list, lang_list, skipknown, updateonly, partial, ids, skipi
     
     info("Manifest saved successfully")
     
-    # If this was a resume, call again with original parameters
+    # If this was a resume, run again with original parameters
     if needresume:
         info('resume completed')
         if resumemode != 'onlyresume':
             info('returning to specified download request...')
-            cmd_update_v2(save_os_list, save_lang_list, save_skipknown, save_updateonly,
-                         save_partial, ids, skipids, skipHidden, save_installers, resumemode,
-                         save_strict, save_strictDupe, save_md5xmls, save_noChangeLogs)
+            return (save_os_list, save_lang_list, save_skipknown, save_updateonly,
+                    save_partial, ids, skipids, skipHidden, save_installers, resumemode,
+                    save_strict, save_strictDupe, save_md5xmls, save_noChangeLogs)
+    return None
 
 
 def cmd_update(os_list, lang_list, skipknown, updateonly, partial, ids, skipids,skipHidden,installers,resumemode,strict,strictDupe,strictDownloadsUpdate,strictExtrasUpdate,md5xmls,noChangeLogs):
@@ -414,15 +429,35 @@ def cmd_update(os_list, lang_list, skipknown, updateonly, partial, ids, skipids,
     Notes:
         - Requires valid authentication token (run cmd_login first)
         - Token is automatically renewed if expiring during update
-        - Manifest is saved periodically (every RESUME_SAVE_THRESHOLD games)
+        - Manifest is saved periodically (every RESUME_SAVE_THRESHOLD games, or
+          RESUME_SAVE_INTERVAL seconds, whichever comes first)
         - Games removed from GOG library are automatically removed from manifest
         - Resume manifest is saved to allow recovery from interruptions
         - Large libraries may take significant time to update completely
     """
+    update_args = (os_list, lang_list, skipknown, updateonly, partial, ids, skipids,skipHidden,installers,resumemode,strict,strictDupe,strictDownloadsUpdate,strictExtrasUpdate,md5xmls,noChangeLogs)
+    # Finishing a resumed update hands back the originally requested arguments. Run
+    # them here rather than recursing, so the first pass' state can be freed first.
+    # Both passes share one session, and with it its open connections.
+    updateSession = makeGOGSession()
+    try:
+        while update_args is not None:
+            update_args = _cmd_update_pass(updateSession, *update_args)
+    finally:
+        # the HEAD/md5 xml lookups are only worth keeping for the length of the run
+        clear_response_cache(updateSession)
+
+
+def _cmd_update_pass(updateSession, os_list, lang_list, skipknown, updateonly, partial, ids, skipids,skipHidden,installers,resumemode,strict,strictDupe,strictDownloadsUpdate,strictExtrasUpdate,md5xmls,noChangeLogs):
+    """Run a single cmd_update pass.
+
+    Returns the arguments of the update that still has to run after a resumed
+    update completes, otherwise None.
+    """
     media_type = GOG_MEDIA_TYPE_GAME
     items = []
-    known_ids = []
-    known_titles = []
+    known_ids = set()
+    known_titles = set()
     i = 0
     
     api_url  = GOG_ACCOUNT_URL
@@ -441,29 +476,24 @@ def cmd_update(os_list, lang_list, skipknown, updateonly, partial, ids, skipids,
         skipknown = True;
         updateonly = True;
     
-    updateSession = makeGOGSession()
     renew_token(updateSession)  # Check and renew token if needed before making requests
     
     try:
         resumedb = load_resume_manifest()
         resumeprops = resumedb.pop()
         needresume = resumemode != "noresume" and not resumeprops['complete']            
-        try:
-            resume_manifest_syntax_version = resumeprops['resume_manifest_syntax_version']
-        except KeyError:
-            resume_manifest_syntax_version = -1
+        resume_manifest_syntax_version = resumeprops.get('resume_manifest_syntax_version', -1)
         if resume_manifest_syntax_version != RESUME_MANIFEST_SYNTAX_VERSION:
             warn('Incompatible Resume Manifest Version Detected.')
-            inp = None
-            
-            while (inp not in ["D","d","A","a"]):
-                inp = input("(D)iscard incompatible manifest or (A)bort? (D/d/A/a): ")
+            while True:
+                inp = input("(D)iscard incompatible manifest or (A)bort? (D/d/A/a): ").strip().lower()
 
-                if (inp in ["D","d"]):
+                if inp == 'd':
                     warn("Discarding")
                     resumedb = None
                     needresume = False
-                elif (inp in ["A","a"]):
+                    break
+                elif inp == 'a':
                     warn("Aborting")
                     sys.exit()
     except Exception:
@@ -485,166 +515,132 @@ def cmd_update(os_list, lang_list, skipknown, updateonly, partial, ids, skipids,
         save_strictExtrasUpdate = strictExtrasUpdate
         save_md5xmls = md5xmls
         save_noChangeLogs = noChangeLogs
-        try:
-            partial = resumeprops['partial']
-        except KeyError:
-            pass
-        try:
-            skipknown = resumeprops['skipknown']
-        except KeyError:
-            pass
-        try:
-            updateonly = resumeprops['updateonly']
-        except KeyError:
-            pass
-        try:
-            strictDupe = resumeprops['strictDupe']
-        except KeyError:
-            strictDupe = True
-        try:
-           strictDownloadsUpdate = resumeprops['strictDownloadsUpdate']
-        except KeyError:
-            strictDownloadsUpdate = True
-        try:
-            strictExtrasUpdate = resumeprops['strictExtrasUpdate']
-        except KeyError:
-            strictExtrasUpdate = False
-        try:
-           md5xmls = resumeprops['md5xmls']
-        except KeyError:
-            md5xmls = True
-        try:
-            noChangeLogs = resumeprops['noChangeLogs']
-        except KeyError:
-            noChangeLogs = False            
+        partial = resumeprops.get('partial', partial)
+        skipknown = resumeprops.get('skipknown', skipknown)
+        updateonly = resumeprops.get('updateonly', updateonly)
+        strictDupe = resumeprops.get('strictDupe', True)
+        strictDownloadsUpdate = resumeprops.get('strictDownloadsUpdate', True)
+        strictExtrasUpdate = resumeprops.get('strictExtrasUpdate', False)
+        md5xmls = resumeprops.get('md5xmls', True)
+        noChangeLogs = resumeprops.get('noChangeLogs', False)
             
         items = resumedb
-        items_count = len(items)
-        print_padding = len(str(items_count))
         
     else:    
-        # Make convenient list of known ids11
-        for item in gamesdb:
-            known_ids.append(item.id)
+        # Make convenient sets of known ids / titles for membership tests
+        for game in gamesdb:
+            known_ids.add(game.id)
+            known_titles.add(game.title)
                 
         idsOriginal = ids[:]       
-
-        for item in gamesdb:
-            known_titles.append(item.title)
+        # requested ids/titles not yet seen in the product data
+        ids = set(ids)
+        skipids_set = set(skipids)
 
             
-        # Fetch shelf data
+        # Fetch shelf data. Page 1 tells us how many pages there are, the rest are
+        # requested concurrently and then parsed in page order.
         done = False
-        while not done:
-            i += 1  # starts at page 1
-            if i == 1:
-                info('fetching game product data (page %d)...' % i)
-            else:
-                info('fetching game product data (page %d / %d)...' % (i, json_data['totalPages']))
-            data_response = request(updateSession,api_url,args={'mediaType': media_type,'sortBy': 'title','page': str(i)})    
-#            with open("text.html","w+",encoding='utf-8') as f:
-#                f.write(data_response.text)
-            try:
-                json_data = data_response.json()
-            except ValueError:
-                error('failed to load product data (are you still logged in?)')
-                raise SystemExit(1)
-
-            # Parse out the interesting fields and add to items dict
-            for item_json_data in json_data['products']:
-                # skip games marked as hidden
-                if skipHidden and (item_json_data.get('isHidden', False) is True):
-                    continue
-
-                item = AttrDict()
-                item.id = item_json_data['id']
-                item.title = item_json_data['slug']
-                item.folder_name = item_json_data['slug']
-                item.long_title = item_json_data['title']
-
-                item.genre = item_json_data['category']
-                item.image_url = item_json_data['image']
-                #item.image_urls[item.long_title] = item_json_data['image']
-                item.store_url = item_json_data['url']
-                item.media_type = media_type
-                item.rating = item_json_data['rating']
-                item.has_updates = bool(item_json_data['updates'])
-                item.old_title = None
-                #mirror these so they appear at the top of the json entry 
-                item._title_mirror =  item.title  
-                item._long_title_mirror = item.long_title
-                item._id_mirror =  item.id
-
-
-                item.gog_data = AttrDict()
-                for key in item_json_data:
-                    try:
-                        tmp_contents = item[key]
-                        if tmp_contents != item_json_data[key]:
+        page_futures = {}
+        with ThreadPoolExecutor(max_workers=HTTP_GAME_DOWNLOADER_THREADS) as executor:
+            while not done:
+                i += 1  # starts at page 1
+                if i == 1:
+                    info('fetching game product data (page %d)...' % i)
+                    json_data = _fetch_product_page(updateSession, api_url, media_type, i)
+                    total_pages = json_data['totalPages']
+                    for page in range(2, total_pages + 1):
+                        page_futures[page] = executor.submit(_fetch_product_page, updateSession, api_url, media_type, page)
+                else:
+                    info('fetching game product data (page %d / %d)...' % (i, total_pages))
+                    json_data = page_futures.pop(i).result()
+
+                # Parse out the interesting fields and add to items dict
+                for item_json_data in json_data['products']:
+                    # skip games marked as hidden
+                    if skipHidden and (item_json_data.get('isHidden', False) is True):
+                        continue
+
+                    item = AttrDict()
+                    item.id = item_json_data['id']
+                    item.title = item_json_data['slug']
+                    item.folder_name = item_json_data['slug']
+                    item.long_title = item_json_data['title']
+
+                    item.genre = item_json_data['category']
+                    item.image_url = item_json_data['image']
+                    #item.image_urls[item.long_title] = item_json_data['image']
+                    item.store_url = item_json_data['url']
+                    item.media_type = media_type
+                    item.rating = item_json_data['rating']
+                    item.has_updates = bool(item_json_data['updates'])
+                    item.old_title = None
+                    #mirror these so they appear at the top of the json entry 
+                    item._title_mirror =  item.title  
+                    item._long_title_mirror = item.long_title
+                    item._id_mirror =  item.id
+
+
+                    item.gog_data = AttrDict()
+                    # only keys we've already set can clash, everything else is copied straight over
+                    for key in item.keys() & item_json_data.keys():
+                        if item[key] != item_json_data[key]:
                             debug("GOG Data Key, %s , for item clashes with Item Data Key storing detailed info in secondary dict" % key)
                             item.gog_data[key] = item_json_data[key]
-                    except Exception:
-                        item[key] = item_json_data[key]
+                    item.update((key, val) for key, val in item_json_data.items() if key not in item)
                 
                 
-                if not done:
-                    if item.title not in skipids and str(item.id) not in skipids: 
-                        if ids: 
-                            if (item.title  in ids or str(item.id) in ids):  # support by game title or gog id
-                                info('scanning found "{}" in product data!'.format(item.title))
-                                try:
-                                    ids.remove(item.title)
-                                except ValueError:
-                                    try:
-                                        ids.remove(str(item.id))
-                                    except ValueError:
-                                        warn("Somehow we have matched an unspecified ID. Huh ?")
-                                if not ids:
-                                    done = True
-                            else:
-                                continue
+                    if not done:
+                        if item.title not in skipids_set and str(item.id) not in skipids_set: 
+                            if ids: 
+                                if (item.title  in ids or str(item.id) in ids):  # support by game title or gog id
+                                    info('scanning found "{}" in product data!'.format(item.title))
+                                    ids.discard(item.title)
+                                    ids.discard(str(item.id))
+                                    if not ids:
+                                        done = True
+                                else:
+                                    continue
                                 
                                 
-                        if (not partial) or (updateonly and item.has_updates) or (skipknown and item.id not in known_ids):  
-                             items.append(item)
-                    else:        
-                        info('skipping "{}" found in product data!'.format(item.title))
+                            if (not partial) or (updateonly and item.has_updates) or (skipknown and item.id not in known_ids):  
+                                 items.append(item)
+                        else:        
+                            info('skipping "{}" found in product data!'.format(item.title))
                     
                 
-            if i >= json_data['totalPages']:
-                done = True
+                if i >= total_pages:
+                    done = True
+            # stop any page requests we no longer need (all requested ids were found)
+            for future in page_futures.values():
+                future.cancel()
                     
      
 
         if not idsOriginal and not updateonly and not skipknown:
-            validIDs = [item.id for item in items]
-            invalidItems = [itemID for itemID in known_ids if itemID not in validIDs and str(itemID) not in skipids]
+            validIDs = {item.id for item in items}
+            invalidItems = [game.id for game in gamesdb if game.id not in validIDs and str(game.id) not in skipids_set]
             if len(invalidItems) != 0: 
                 warn('old games in manifest. Removing ...')
                 for item in invalidItems:
                     warn('Removing id "{}" from manifest'.format(item))
-                    item_idx = item_checkdb(item, gamesdb)
-                    if item_idx is not None:
-                        del gamesdb[item_idx]
+                removedIDs = set(invalidItems)
+                gamesdb[:] = [game for game in gamesdb if game.id not in removedIDs]
         
         if ids and not updateonly and not skipknown:
-            invalidTitles = [id for id in ids if id in known_titles]    
-            invalidIDs = [int(id) for id in ids if is_numeric_id(id) and int(id) in known_ids]
-            invalids = invalidIDs + invalidTitles
+            invalidTitles = {id for id in ids if id in known_titles}    
+            invalidIDs = sorted(int(id) for id in ids if is_numeric_id(id) and int(id) in known_ids)
+            invalids = invalidIDs + sorted(invalidTitles)
             if invalids:
                 formattedInvalids =  ', '.join(map(str, invalids))        
                 warn(' game id(s) from {%s} were in your manifest but not your product data ' % formattedInvalids)
                 titlesToIDs = [(game.id,game.title) for game in gamesdb if game.title in invalidTitles]
                 for invalidID in invalidIDs:
                     warn('Removing id "{}" from manifest'.format(invalidID))
-                    item_idx = item_checkdb(invalidID, gamesdb)
-                    if item_idx is not None:
-                        del gamesdb[item_idx]
                 for invalidID,invalidTitle in titlesToIDs:
                     warn('Removing id "{}" from manifest'.format(invalidTitle))
-                    item_idx = item_checkdb(invalidID, gamesdb)
-                    if item_idx is not None:
-                        del gamesdb[item_idx]
+                removedIDs = set(invalidIDs).union(invalidID for invalidID, _ in titlesToIDs)
+                gamesdb[:] = [game for game in gamesdb if game.id not in removedIDs]
                 save_manifest(gamesdb)
 
                         
@@ -664,154 +660,179 @@ def cmd_update(os_list, lang_list, skipknown, updateonly, partial, ids, skipids,
             return
             
             
-        items_count = len(items)
-        print_padding = len(str(items_count))
         if not idsOriginal and not updateonly and not skipknown:
-            info('found %d games !!%s' % (items_count, '!'*int(items_count/100)))  # teehee
+            items_count = len(items)
+            info('found %d games !!%s' % (items_count, '!' * (items_count // 100)))  # teehee
             if skipids: 
                 formattedSkipIds =  ', '.join(map(str, skipids))        
                 info('not including game id(s) from {%s}' % formattedSkipIds)
             
             
     # fetch item details
-    i = 0
-    resumedb = sorted(items, key=lambda item: item.title)
+    items.sort(key=lambda item: item.title)
     resumeprop = {'resume_manifest_syntax_version':RESUME_MANIFEST_SYNTAX_VERSION,'os_list':os_list,'lang_list':lang_list,'installers':installers,'strict':strict,'complete':False,'skipknown':skipknown,'partial':partial,'updateonly':updateonly,'strictDupe':strictDupe,'strictDownloadsUpdate':strictDownloadsUpdate,'strictExtrasUpdate':strictExtrasUpdate,'md5xmls':md5xmls,'noChangeLogs':noChangeLogs}
-    resumedb.append(resumeprop)
-    save_resume_manifest(resumedb)                    
-    
-    resumedbInitLength = len(resumedb)
-    for item in sorted(items, key=lambda item: item.title):
-        api_url  = GOG_ACCOUNT_URL
-        api_url += "/gameDetails/{}.json".format(item.id)
-        
-        
-
-        i += 1
-        info("(%*d / %d) fetching game details for %s..." % (print_padding, i, items_count, item.title))
-
-        try:
-            response = request(updateSession,api_url)
-            
-            item_json_data = response.json()
-
-            item.bg_url = item_json_data['backgroundImage']
-            item.bg_urls = AttrDict()
-            if urlparse(item.bg_url).path != "":
-                item.bg_urls[item.long_title] = item.bg_url
-            item.serial = item_json_data['cdKey']
-            if (not(item.serial.isprintable())): #Probably encoded in UTF-16
+    save_resume_manifest(items + [resumeprop])
+    
+    completed = 0
+    last_save = time.time()
+    # id -> position in gamesdb, kept in step with the appends below
+    gamesdb_index = {game.id: idx for idx, game in enumerate(gamesdb)}
+    # e.g. "( 7 / 42) fetching game details for %s...", padded to the width of the total
+    progress_fmt = '(%%%dd / %d) fetching game details for %%s...' % (len(str(len(items))), len(items))
+    # Only the gameDetails requests run on a small pool of workers, so the round-trips
+    # overlap; parsing, filtering and merging into gamesdb stay on this thread, in order,
+    # so the resume manifest never holds a half rebuilt item. At most two requests per
+    # worker are queued ahead, an interrupt cancels those and the resume manifest picks
+    # them up next run.
+    with CancellingThreadPoolExecutor(max_workers=HTTP_GAME_DOWNLOADER_THREADS) as executor:
+        details = bounded_map(executor, lambda job: _fetch_game_details(updateSession, *job),
+                              ((item, progress_fmt % (i, item.title)) for i, item in enumerate(items, 1)),
+                              2 * HTTP_GAME_DOWNLOADER_THREADS)
+        for item, item_json_data in zip(items, details):
+            if item_json_data is not None and _apply_game_details(updateSession, item, item_json_data, os_list, lang_list, installers, strictDupe, md5xmls, noChangeLogs):
                 try:
-                    pserial = item.serial
-                    if (len(pserial) % 2): #0dd
-                        pserial=pserial+"\x00" 
-                    pserial = bytes(pserial,"UTF-8")
-                    pserial = pserial.decode("UTF-16")
-                    if pserial.isprintable():
-                        item.serial = pserial
+                    # update gamesdb with new item
+                    item_idx = gamesdb_index.get(item.id)
+                    if item_idx is not None:
+                        handle_game_updates(gamesdb[item_idx], item,strict, strictDownloadsUpdate, strictExtrasUpdate)
+                        gamesdb[item_idx] = item
                     else:
-                        warn('Game serial code is unprintable, storing raw')
+                        gamesdb_index[item.id] = len(gamesdb)
+                        gamesdb.append(item)
                 except Exception:
-                     warn('Game serial code is unprintable and decoding failed, storing raw')
-            item.serials = AttrDict()
-            if item.serial != '':
-                item.serials[item.long_title] = item.serial
-            item.used_titles = [item.long_title]
-            item.forum_url = item_json_data['forumLink']
-            if (noChangeLogs):
-                item_json_data['changelog'] = '' #Doing it this way prevents it getting stored as Detailed GOG Data later (which causes problems because it then lacks the changelog_end demarcation and becomes almost impossible to parse)
-            item.changelog = item_json_data['changelog']
-            item.changelog_end = None
-            item.release_timestamp = item_json_data['releaseTimestamp']
-            item.gog_messages = item_json_data['messages']
-            item.downloads = []
-            item.galaxyDownloads = []
-            item.sharedDownloads = []
-            item.extras = []
-            item.detailed_gog_data = AttrDict()
-            for key in item_json_data:
-                if key not in ["downloads","extras","galaxyDownloads","dlcs"]: #DLCS lose some info in processing, need to fix that when extending.  #This data is going to be stored after filtering (#Consider storing languages / OSes in case new ones are added)
-                    try:
-                        tmp_contents = item[key]
-                        if tmp_contents != item_json_data[key]:
-                            debug("Detailed GOG Data Key, %s , for item clashes with Item Data Key attempting to store detailed info in secondary dict" % key)
-                            try:
-                                tmp_contents = item.gog_data[key]
-                                if tmp_contents != item_json_data[key]:
-                                    debug("GOG Data Key, %s  ,for item clashes with Item Secondary Data Key storing detailed info in tertiary dict" % key)
-                                    item.detailed_gog_data[key] = item_json_data[key]
-                            except Exception:
-                                item.gog_data[key] = item_json_data[key]
-                    except Exception:
-                        item[key] = item_json_data[key]
-            # parse json data for downloads/extras/dlcs
-            filter_downloads(item.downloads, item_json_data['downloads'], lang_list, os_list,md5xmls,updateSession)
-            filter_downloads(item.galaxyDownloads, item_json_data['galaxyDownloads'], lang_list, os_list,md5xmls,updateSession)                
-            filter_extras(item.extras, item_json_data['extras'],md5xmls,updateSession)
-            filter_dlcs(item, item_json_data['dlcs'], lang_list, os_list,md5xmls,updateSession)
-            
-            
-            #Indepent Deduplication to make sure there are no doubles within galaxyDownloads or downloads to avoid weird stuff with the comprehention.
-            item.downloads = deDuplicateList(item.downloads,{},strictDupe)  
-            item.galaxyDownloads = deDuplicateList(item.galaxyDownloads,{},strictDupe) 
-            
-            item.sharedDownloads = [x for x in item.downloads if x in item.galaxyDownloads]
-            if (installers=='galaxy'):
-                item.downloads = []
-            else:
-                item.downloads = [x for x in item.downloads if x not in item.sharedDownloads]
-            if (installers=='standalone'):
-                item.galaxyDownloads = []
-            else:        
-                item.galaxyDownloads = [x for x in item.galaxyDownloads if x not in item.sharedDownloads]
-                            
-            existingItems = {}                
-            item.downloads = deDuplicateList(item.downloads,existingItems,strictDupe)  
-            item.galaxyDownloads = deDuplicateList(item.galaxyDownloads,existingItems,strictDupe) 
-            item.sharedDownloads = deDuplicateList(item.sharedDownloads,existingItems,strictDupe)                 
-            item.extras = deDuplicateList(item.extras,existingItems,strictDupe)
-            
-            # update gamesdb with new item
-            item_idx = item_checkdb(item.id, gamesdb)
-            if item_idx is not None:
-                handle_game_updates(gamesdb[item_idx], item,strict, strictDownloadsUpdate, strictExtrasUpdate)
-                gamesdb[item_idx] = item
-            else:
-                gamesdb.append(item)
-        except Exception:
-            warn("The handled exception was:")
-            log_exception('error')
-            warn("End exception report.")        
-        resumedb.remove(item)    
-        if (updateonly or skipknown or (resumedbInitLength - len(resumedb)) % RESUME_SAVE_THRESHOLD == 0):
-            save_manifest(gamesdb)                
-            save_resume_manifest(resumedb)                
-
-    global_dupes = []
-    sorted_gamesdb =  sorted(gamesdb, key = lambda game : game.title)
-    for game in sorted_gamesdb:
-        if game not in global_dupes:
-            index = sorted_gamesdb.index(game)
-            dupes = [game]
-            while (len(sorted_gamesdb)-1 >= index+1 and sorted_gamesdb[index+1].title == game.title):
-                dupes.append(sorted_gamesdb[index+1])
-                index = index + 1
-            if len(dupes) > 1:
-                global_dupes.extend(dupes)
-            
-    for dupe in global_dupes:
-        dupe.folder_name = dupe.title + "_" + str(dupe.id)
+                    warn("The handled exception was:")
+                    log_exception('error')
+                    warn("End exception report.")        
+            completed += 1
+            if (completed % RESUME_SAVE_THRESHOLD == 0 or time.time() - last_save > RESUME_SAVE_INTERVAL):
+                save_manifest(gamesdb)                
+                save_resume_manifest(items[completed:] + [resumeprop])
+                last_save = time.time()
+
     #Store stuff in the DB in alphabetical order
     sorted_gamesdb =  sorted(gamesdb, key = lambda game : game.title)
+    # games sharing a title are adjacent once sorted, give each its own folder
+    for _, dupes in groupby(sorted_gamesdb, key = lambda game : game.title):
+        dupes = list(dupes)
+        if len(dupes) > 1:
+            for dupe in dupes:
+                dupe.folder_name = dupe.title + "_" + str(dupe.id)
     # save the manifest to disk
     save_manifest(sorted_gamesdb,update_md5_xml=md5xmls,delete_md5_xml=md5xmls)
     resumeprop['complete'] = True    
-    save_resume_manifest(resumedb) 
+    save_resume_manifest(items[completed:] + [resumeprop]) 
     if (needresume):
         info('resume completed')
         if (resumemode != 'onlyresume'):
             info('returning to specified download request...')
-            cmd_update(save_os_list, save_lang_list, save_skipknown, save_updateonly, save_partial, ids, skipids,skipHidden,save_installers,resumemode,save_strict,save_strictDupe,save_strictDownloadsUpdate,save_strictExtrasUpdate,save_md5xmls,save_noChangeLogs)
+            return (save_os_list, save_lang_list, save_skipknown, save_updateonly, save_partial, ids, skipids,skipHidden,save_installers,resumemode,save_strict,save_strictDupe,save_strictDownloadsUpdate,save_strictExtrasUpdate,save_md5xmls,save_noChangeLogs)
+    return None
+
+
+def _fetch_product_page(updateSession, api_url, media_type, page):
+    """Fetch and decode one page of getFilteredProducts data for cmd_update."""
+    data_response = request(updateSession,api_url,args={'mediaType': media_type,'sortBy': 'title','page': str(page)})    
+    try:
+        return response_json(data_response)
+    except ValueError:
+        error('failed to load product data (are you still logged in?)')
+        raise SystemExit(1)
+
+
+def _fetch_game_details(updateSession, item, progress_msg):
+    """Fetch and decode gameDetails for a single product.
+
+    Runs on a worker thread from cmd_update and doesn't touch ``item``. Returns
+    the decoded json, or None if the fetch failed (the exception is logged).
+    """
+    api_url = f"{GOG_ACCOUNT_URL}/gameDetails/{item.id}.json"
+
+    info(progress_msg)
+
+    try:
+        response = request(updateSession,api_url)
+        return response_json(response)
+    except Exception:
+        warn("The handled exception was:")
+        log_exception('error')
+        warn("End exception report.")
+        return None
+
+
+def _apply_game_details(updateSession, item, item_json_data, os_list, lang_list, installers, strictDupe, md5xmls, noChangeLogs):
+    """Fill in item's details, downloads and extras from its gameDetails json.
+
+    Returns True on success, False if parsing failed (the exception is logged and
+    the item left unmerged).
+    """
+    try:
+        item.bg_url = item_json_data['backgroundImage']
+        item.bg_urls = AttrDict()
+        if urlparse(item.bg_url).path != "":
+            item.bg_urls[item.long_title] = item.bg_url
+        item.serial = decode_serial(item_json_data['cdKey']) #Probably encoded in UTF-16 if unprintable
+        item.serials = AttrDict()
+        if item.serial != '':
+            item.serials[item.long_title] = item.serial
+        item.used_titles = [item.long_title]
+        item.forum_url = item_json_data['forumLink']
+        if (noChangeLogs):
+            item_json_data['changelog'] = '' #Doing it this way prevents it getting stored as Detailed GOG Data later (which causes problems because it then lacks the changelog_end demarcation and becomes almost impossible to parse)
+        item.changelog = item_json_data['changelog']
+        item.changelog_end = None
+        item.release_timestamp = item_json_data['releaseTimestamp']
+        item.gog_messages = item_json_data['messages']
+        item.downloads = []
+        item.galaxyDownloads = []
+        item.sharedDownloads = []
+        item.extras = []
+        item.detailed_gog_data = AttrDict()
+        for key, val in item_json_data.items():
+            if key not in DETAIL_LIST_KEYS: #DLCS lose some info in processing, need to fix that when extending.  #This data is going to be stored after filtering (#Consider storing languages / OSes in case new ones are added)
+                if key not in item:
+                    item[key] = val
+                elif item[key] != val:
+                    debug("Detailed GOG Data Key, %s , for item clashes with Item Data Key attempting to store detailed info in secondary dict" % key)
+                    if key not in item.gog_data:
+                        item.gog_data[key] = val
+                    elif item.gog_data[key] != val:
+                        debug("GOG Data Key, %s  ,for item clashes with Item Secondary Data Key storing detailed info in tertiary dict" % key)
+                        item.detailed_gog_data[key] = val
+        # parse json data for downloads/extras/dlcs
+        filter_downloads(item.downloads, item_json_data['downloads'], lang_list, os_list,md5xmls,updateSession)
+        filter_downloads(item.galaxyDownloads, item_json_data['galaxyDownloads'], lang_list, os_list,md5xmls,updateSession)                
+        filter_extras(item.extras, item_json_data['extras'],md5xmls,updateSession)
+        filter_dlcs(item, item_json_data['dlcs'], lang_list, os_list,md5xmls,updateSession)
+        
+        
+        #Indepent Deduplication to make sure there are no doubles within galaxyDownloads or downloads to avoid weird stuff with the comprehention.
+        item.downloads = deDuplicateList(item.downloads,{},strictDupe)  
+        item.galaxyDownloads = deDuplicateList(item.galaxyDownloads,{},strictDupe) 
+        
+        galaxy_index = index_downloads(item.galaxyDownloads)
+        item.sharedDownloads = [x for x in item.downloads if in_download_index(x, galaxy_index)]
+        shared_index = index_downloads(item.sharedDownloads)
+        if (installers=='galaxy'):
+            item.downloads = []
+        else:
+            item.downloads = [x for x in item.downloads if not in_download_index(x, shared_index)]
+        if (installers=='standalone'):
+            item.galaxyDownloads = []
+        else:        
+            item.galaxyDownloads = [x for x in item.galaxyDownloads if not in_download_index(x, shared_index)]
+                        
+        # downloads are already clash free from the independent pass above, so just record their names
+        existingItems = {}                
+        registerDeDuplicatedList(item.downloads,existingItems)
+        item.galaxyDownloads = deDuplicateList(item.galaxyDownloads,existingItems,strictDupe) 
+        item.sharedDownloads = deDuplicateList(item.sharedDownloads,existingItems,strictDupe)                 
+        item.extras = deDuplicateList(item.extras,existingItems,strictDupe)
+        return True
+    except Exception:
+        warn("The handled exception was:")
+        log_exception('error')
+        warn("End exception report.")
+        return False
 
 
 def cmd_import(src_dir, dest_dir, os_list, lang_list, skipextras, skipids, ids, skipgalaxy, skipstandalone, skipshared, destructive):
@@ -863,65 +884,56 @@ def cmd_import(src_dir, dest_dir, os_list, lang_list, skipextras, skipids, ids,
     size_info = build_md5_lookup(gamesdb, game_filter)
         
     info("searching for files within '%s'" % src_dir)
-    file_list = []
-    for (root, dirnames, filenames) in os.walk(src_dir):
-        for f in filenames:
-            if (os.extsep + f.rsplit(os.extsep,1)[1]).lower() not in SKIP_MD5_FILE_EXT: #Need to extend this to cover tar.gz too
-                file_list.append(os.path.join(root, f))
+    #Need to extend this to cover tar.gz too
+    # only files with a size known to the manifest can match, so the rest are dropped during the walk
+    candidates = [(f, s) for (f, s) in iter_files_with_size(src_dir, SKIP_MD5_FILE_EXT) if s in size_info]
 
     info("comparing md5 file hashes")
-    for f in file_list:
-        fname = os.path.basename(f)
-        info("calculating filesize for '%s'" % fname)
-        s = os.path.getsize(f)
-        if s in size_info:
-            info("calculating md5 for '%s'" % fname)
-            md5_info = size_info[s]
-            h = hashfile(f)
-            if h in md5_info:
-                info('found match(es) for file %s with size [%s] and MD5 [%s]' % (fname,s, h))
-                items = md5_info[h]
-                for (folder_name,file_name) in items:
-                    game_dest_dir = os.path.join(dest_dir, folder_name)
-                    dest_file = os.path.join(game_dest_dir, file_name)
-                    info('match! %s' % (dest_file))
-                    if os.path.isfile(dest_file):
-                        if s == os.path.getsize(dest_file) and h == hashfile(dest_file):
-                            info('destination file already exists with the same size and md5 value. skipping %s.' % stringOperation)
-                            continue
-                    info("%s to %s..." % (stringOperationP, dest_file))
-                    if not os.path.isdir(game_dest_dir):
-                        os.makedirs(game_dest_dir)
-                    if destructive:
-                        shutil.move(f, dest_file)
-                    else:
-                        shutil.copy(f, dest_file)
-                    entry = items[(folder_name,file_name)]
-                    changed = False
-                    try:
-                        if entry.force_change == True:
-                            entry.has_changed = False
-                            changed = True
-                    except AttributeError:
-                        setattr(entry,"has_changed",False)
-                        changed = True
-                    try:
-                        if entry.old_updated != entry.updated:
-                            entry.old_updated = entry.updated
-                            changed = True
-                    except AttributeError:
-                        setattr(entry,"updated",None)
-                        setattr(entry,"old_updated",None)
-                        changed = True
-                    try:
-                        if entry.prev_verified == False:
-                            entry.prev_verified = True # This isn't guaranteed to actually be the file but anything that makes it this far will pass the verify check anyway
-                            changed = True
-                    except AttributeError:
-                        setattr(entry,"prev_verified",True)
-                        changed = True
-                    if changed:
-                        save_manifest(gamesdb)
+    # hash the candidates in the background while matches are handled here
+    unsaved_changes = 0
+    # share cmd_verify's md5 cache, so files that were imported or verified before aren't re-read
+    # the source tree isn't ours, its hashes are only kept in MD5_DB, never in xattrs on its files
+    hash_cache = BufferedShelf(shelve.open(MD5_DB, protocol=2))
+    hash_cache_lock = threading.Lock()
+    # an interrupt cancels the hashes still queued, the ones done so far are kept in the cache
+    try:
+        with CancellingThreadPoolExecutor(max_workers=HASH_THREADS) as executor:
+            hashes = executor.map(lambda f: _cached_hashfile(f, os.stat(f), hash_cache, hash_cache_lock, use_xattr=False), [f for (f, s) in candidates])
+            for (f, s), h in zip(candidates, hashes):
+                fname = os.path.basename(f)
+                info("calculated md5 for '%s'" % fname)
+                md5_info = size_info[s]
+                if h in md5_info:
+                    info('found match(es) for file %s with size [%s] and MD5 [%s]' % (fname,s, h))
+                    items = md5_info[h]
+                    for (folder_name,file_name) in items:
+                        game_dest_dir = os.path.join(dest_dir, folder_name)
+                        dest_file = os.path.join(game_dest_dir, file_name)
+                        info('match! %s' % (dest_file))
+                        dest_st = stat_file(dest_file)
+                        if dest_st is not None:
+                            if s == dest_st.st_size and h == _cached_hashfile(dest_file, dest_st, hash_cache, hash_cache_lock):
+                                info('destination file already exists with the same size and md5 value. skipping %s.' % stringOperation)
+                                continue
+                        info("%s to %s..." % (stringOperationP, dest_file))
+                        if not os.path.isdir(game_dest_dir):
+                            os.makedirs(game_dest_dir)
+                        if destructive:
+                            fast_move(f, dest_file)
+                        else:
+                            fast_copy(f, dest_file)
+                        # the copy has a fresh mtime but the content hash is already known
+                        _store_hash(dest_file, os.stat(dest_file), h, hash_cache, hash_cache_lock)
+                        if _mark_imported(items[(folder_name,file_name)]):
+                            # checkpoint now and then rather than rewriting the whole manifest per file
+                            unsaved_changes += 1
+                            if unsaved_changes >= RESUME_SAVE_THRESHOLD:
+                                save_manifest(gamesdb)
+                                unsaved_changes = 0
+    finally:
+        hash_cache.close()
+    if unsaved_changes:
+        save_manifest(gamesdb)
 
 def cmd_clear_partial_downloads(cleandir, dryrun):
     """Remove incomplete download directories left from interrupted downloads.
@@ -960,27 +972,19 @@ def cmd_clear_partial_downloads(cleandir, dryrun):
         # Actually deletes partial download directories
     """
     downloading_root_dir = os.path.join(cleandir, DOWNLOADING_DIR_NAME)
-    for dir in os.listdir(downloading_root_dir):
-        if dir != PROVISIONAL_DIR_NAME:
-            testdir= os.path.join(downloading_root_dir,dir)
-            if os.path.isdir(testdir):
-                try:
-                    if (not dryrun):
-                        shutil.rmtree(testdir)
-                    info("Deleting " + testdir)
-                except Exception:
-                    error("Failed to delete directory: " + testdir)
+    partial_dirs = []
+    with os.scandir(downloading_root_dir) as it:
+        for entry in it:
+            if not entry.is_dir():
+                continue
+            if entry.name == PROVISIONAL_DIR_NAME:
+                # keep the provisional directory itself, only clear out what's in it
+                with os.scandir(entry.path) as provisional_it:
+                    partial_dirs.extend(sub.path for sub in provisional_it if sub.is_dir())
+            else:
+                partial_dirs.append(entry.path)
 
-    provisional_root_dir = os.path.join(cleandir, DOWNLOADING_DIR_NAME,PROVISIONAL_DIR_NAME)
-    for dir in os.listdir(provisional_root_dir):
-        testdir= os.path.join(downloading_root_dir,dir)
-        if os.path.isdir(testdir):
-            try:
-                if (not dryrun):
-                    shutil.rmtree(testdir)
-                info("Deleting " + testdir)
-            except Exception:
-                error("Failed to delete directory: " + testdir)
+    _remove_dirs(partial_dirs, dryrun)
 
 def cmd_trash(cleandir,installers,images,dryrun):
     """Delete orphaned files and directories that were moved by the clean command.
@@ -1040,12 +1044,13 @@ def cmd_trash(cleandir,installers,images,dryrun):
         # Deletes entire orphaned game directories
     """
     downloading_root_dir = os.path.join(cleandir, ORPHAN_DIR_NAME)
+    whole_dirs = []
     for dir in os.listdir(downloading_root_dir):
         testdir= os.path.join(downloading_root_dir,dir)
         if os.path.isdir(testdir):
             if installers:
                 contents = os.listdir(testdir)
-                deletecontents = [x for x in contents if (len(x.rsplit(os.extsep,1)) > 1 and (os.extsep + x.rsplit(os.extsep,1)[1]) in INSTALLERS_EXT)]
+                deletecontents = [x for x in contents if file_ext(x) in INSTALLERS_EXT]
                 for content in deletecontents:
                     contentpath = os.path.join(testdir,content)
                     if (not dryrun):
@@ -1058,12 +1063,7 @@ def cmd_trash(cleandir,installers,images,dryrun):
                         shutil.rmtree(images_folder)
                     info("Deleting " + images_folder )
             if not ( installers or images):
-                try:
-                    if (not dryrun):
-                        shutil.rmtree(testdir)
-                    info("Deleting " + testdir)
-                except Exception:
-                    error("Failed to delete directory: " + testdir)
+                whole_dirs.append(testdir)
             else:
                 try:
                     if (not dryrun):
@@ -1071,6 +1071,20 @@ def cmd_trash(cleandir,installers,images,dryrun):
                     info("Removed empty directory " + testdir)
                 except OSError:
                     pass
+    _remove_dirs(whole_dirs, dryrun)
+
+def _remove_dirs(dirs, dryrun):
+    """shutil.rmtree() each of dirs, logging the outcome. The trees are independent and
+    the unlink calls release the GIL, so a few are removed at once."""
+    def remove(testdir):
+        try:
+            if (not dryrun):
+                shutil.rmtree(testdir)
+            info("Deleting " + testdir)
+        except Exception:
+            error("Failed to delete directory: " + testdir)
+    with ThreadPoolExecutor(max_workers=DELETE_THREADS) as executor:
+        list(executor.map(remove, dirs))
 
 def cmd_backup(src_dir, dest_dir,skipextras,os_list,lang_list,ids,skipids,skipgalaxy,skipstandalone,skipshared):
     """Copy game files from source to backup destination, validating against the manifest.
@@ -1155,27 +1169,15 @@ def cmd_backup(src_dir, dest_dir,skipextras,os_list,lang_list,ids,skipids,skipga
         # Backs up only Witcher 3 with all installer types and extras
     """
     gamesdb = load_manifest()
-    
-    for game in gamesdb:
-        try:
-            _ = game.folder_name
-        except AttributeError:
-            game.folder_name = game.title
+
+    valid_langs = frozenset(LANG_TABLE[lang] for lang in lang_list)
+    valid_os = frozenset(os_list)
+    ids = frozenset(ids or ())
+    skipids = frozenset(skipids or ())
 
     info('finding all known files in the manifest')
     for game in sorted(gamesdb, key=lambda g: g.folder_name):
         touched = False
-        
-        try:
-            _ = game.galaxyDownloads
-        except AttributeError:
-            game.galaxyDownloads = []
-            
-        try:
-            a = game.sharedDownloads
-        except AttributeError:
-            game.sharedDownloads = []
-        
 
         if skipextras:
             game.extras = []
@@ -1195,56 +1197,41 @@ def cmd_backup(src_dir, dest_dir,skipextras,os_list,lang_list,ids,skipids,skipga
             continue
     
                         
-        downloadsOS = [game_item for game_item in game.downloads if game_item.os_type in os_list]
-        game.downloads = downloadsOS
-        
-        downloadsOS = [game_item for game_item in game.galaxyDownloads if game_item.os_type in os_list]
-        game.galaxyDownloads = downloadsOS
-        
-        downloadsOS = [game_item for game_item in game.sharedDownloads if game_item.os_type in os_list]
-        game.sharedDownloads = downloadsOS
-                
-
-        valid_langs = []
-        for lang in lang_list:
-            valid_langs.append(LANG_TABLE[lang])
-
-        downloadslangs = [game_item for game_item in game.downloads if game_item.lang in valid_langs]
-        game.downloads = downloadslangs
-        
-        downloadslangs = [game_item for game_item in game.galaxyDownloads if game_item.lang in valid_langs]
-        game.galaxyDownloads = downloadslangs
-
-        downloadslangs = [game_item for game_item in game.sharedDownloads if game_item.lang in valid_langs]
-        game.sharedDownloads = downloadslangs
-        
-        
-        for itm in game.downloads + game.galaxyDownloads + game.sharedDownloads + game.extras:
+        game.downloads = [game_item for game_item in game.downloads if game_item.os_type in valid_os and game_item.lang in valid_langs]
+        game.galaxyDownloads = [game_item for game_item in game.galaxyDownloads if game_item.os_type in valid_os and game_item.lang in valid_langs]
+        game.sharedDownloads = [game_item for game_item in game.sharedDownloads if game_item.os_type in valid_os and game_item.lang in valid_langs]
+
+        src_game_dir = os.path.join(src_dir, game.folder_name)
+        dest_game_dir = os.path.join(dest_dir, game.folder_name)
+        # one listing of each game directory rather than a stat per manifest file
+        src_sizes = dir_file_sizes(src_game_dir)
+        dest_sizes = None
+        for itm in chain(game.downloads, game.galaxyDownloads, game.sharedDownloads, game.extras):
             if itm.name is None:
                 continue
-                
-                
 
-            src_game_dir = os.path.join(src_dir, game.folder_name)
             src_file = os.path.join(src_game_dir, itm.name)
-            dest_game_dir = os.path.join(dest_dir, game.folder_name)
             dest_file = os.path.join(dest_game_dir, itm.name)
 
-            if os.path.isfile(src_file):
-                if itm.size != os.path.getsize(src_file):
+            src_size = src_sizes.get(itm.name)
+            if src_size is not None:
+                if itm.size != src_size:
                     warn('source file %s has unexpected size. skipping.' % src_file)
                     continue
-                if not os.path.isdir(dest_game_dir):
-                    os.makedirs(dest_game_dir)
-                if not os.path.exists(dest_file) or itm.size != os.path.getsize(dest_file):
+                if dest_sizes is None:
+                    if not os.path.isdir(dest_game_dir):
+                        os.makedirs(dest_game_dir)
+                    dest_sizes = dir_file_sizes(dest_game_dir)
+                if itm.size != dest_sizes.get(itm.name):
                     info('copying to %s...' % dest_file)
-                    shutil.copy(src_file, dest_file)
+                    fast_copy(src_file, dest_file)
+                    dest_sizes[itm.name] = itm.size
                     touched = True
 
         # backup the info and serial files too
-        if touched and os.path.isdir(dest_game_dir):
+        if touched:
             for extra_file in [INFO_FILENAME, SERIAL_FILENAME]:
-                if os.path.exists(os.path.join(src_game_dir, extra_file)):
+                if extra_file in src_sizes:
                     shutil.copy(os.path.join(src_game_dir, extra_file), dest_game_dir)
 
 def cmd_clean(cleandir, dryrun):
@@ -1336,18 +1323,12 @@ def cmd_clean(cleandir, dryrun):
         # Updates manifest after moving files marked for change
     """
     items = load_manifest()
-    items_by_title = {}
     total_size = 0  # in bytes
     have_cleaned = False
     
 
-    # make convenient dict with title/dirname as key
-    for item in items:
-        try:
-            _ = item.folder_name
-        except AttributeError:
-            item.folder_name = item.title
-        items_by_title[item.folder_name] = item
+    # make convenient dict with title/dirname as key (load_manifest fills in any missing folder_name)
+    items_by_title = {item.folder_name: item for item in items}
 
     # create orphan root dir
     orphan_root_dir = os.path.join(cleandir, ORPHAN_DIR_NAME)
@@ -1357,10 +1338,14 @@ def cmd_clean(cleandir, dryrun):
 
     info("scanning local directories within '{}'...".format(cleandir))
     handle_game_renames(cleandir,items,dryrun)
-    for cur_dir in sorted(os.listdir(cleandir)):
+    # the DirEntry objects carry the file type (and on Windows the size), saving a stat per entry
+    with os.scandir(cleandir) as it:
+        dir_entries = sorted(it, key=lambda entry: entry.name)
+    for dir_entry in dir_entries:
+        cur_dir = dir_entry.name
         changed_game_items = {}
-        cur_fulldir = os.path.join(cleandir, cur_dir)
-        if os.path.isdir(cur_fulldir) and cur_dir not in ORPHAN_DIR_EXCLUDE_LIST:
+        cur_fulldir = dir_entry.path
+        if dir_entry.is_dir() and cur_dir not in ORPHAN_DIR_EXCLUDE_LIST:
             if cur_dir not in items_by_title:
                 info("orphaning dir  '{}'".format(cur_dir))
                 have_cleaned = True
@@ -1369,37 +1354,30 @@ def cmd_clean(cleandir, dryrun):
                     move_with_increment_on_clash(cur_fulldir, os.path.join(orphan_root_dir,cur_dir))
             else:
                 # dir is valid game folder, check its files
-                expected_filenames = []
-                for game_item in items_by_title[cur_dir].downloads + items_by_title[cur_dir].galaxyDownloads + items_by_title[cur_dir].sharedDownloads + items_by_title[cur_dir].extras:
-                    try:                    
-                        _ = game_item.force_change
-                    except AttributeError:
-                        game_item.force_change = False
-                    try:                    
-                        _ = game_item.updated
-                    except AttributeError:
-                        game_item.updated = None
-                    try:                    
-                        _ = game_item.old_updated
-                    except AttributeError:
-                        game_item.old_updated = None
-                    expected_filenames.append(game_item.name)
+                expected_filenames = set()
+                game = items_by_title[cur_dir]
+                for game_item in chain(game.downloads, game.galaxyDownloads, game.sharedDownloads, game.extras):
+                    expected_filenames.add(game_item.name)
 
                     if game_item.force_change == True:
                         changed_game_items[game_item.name] = game_item
-                for cur_dir_file in os.listdir(cur_fulldir):
-                    if os.path.isdir(os.path.join(cleandir, cur_dir, cur_dir_file)):
+                with os.scandir(cur_fulldir) as it:
+                    file_entries = list(it)
+                dest_dir = os.path.join(orphan_root_dir, cur_dir)
+                dest_created = False
+                for file_entry in file_entries:
+                    cur_dir_file = file_entry.name
+                    if file_entry.is_dir():
                         continue  # leave subdirs alone
                     if cur_dir_file not in expected_filenames and cur_dir_file not in ORPHAN_FILE_EXCLUDE_LIST:
                         info("orphaning file '{}'".format(os.path.join(cur_dir, cur_dir_file)))
-                        dest_dir = os.path.join(orphan_root_dir, cur_dir)
-                        if not os.path.isdir(dest_dir):
-                            if not dryrun:
-                                os.makedirs(dest_dir)
-                        file_to_move = os.path.join(cleandir, cur_dir, cur_dir_file)
+                        if not dest_created and not dryrun:
+                            os.makedirs(dest_dir, exist_ok=True)
+                            dest_created = True
+                        file_to_move = file_entry.path
                         if not dryrun:
                             try:
-                                file_size = os.path.getsize(file_to_move)
+                                file_size = file_entry.stat().st_size
                                 move_with_increment_on_clash(file_to_move, os.path.join(dest_dir,cur_dir_file))
                                 have_cleaned = True
                                 total_size += file_size                                
@@ -1408,17 +1386,16 @@ def cmd_clean(cleandir, dryrun):
                                 error("could not move to destination '{}'".format(os.path.join(dest_dir,cur_dir_file)))
                         else:
                             have_cleaned = True
-                            total_size += os.path.getsize(file_to_move)
-                    if cur_dir_file in changed_game_items.keys() and cur_dir_file in expected_filenames:
+                            total_size += file_entry.stat().st_size
+                    elif cur_dir_file in changed_game_items:  # every changed item's name is also expected, so never both
                         info("orphaning file '{}' as it has been marked for change.".format(os.path.join(cur_dir, cur_dir_file)))
-                        dest_dir = os.path.join(orphan_root_dir, cur_dir)
-                        if not os.path.isdir(dest_dir):
-                            if not dryrun:
-                                os.makedirs(dest_dir)
-                        file_to_move = os.path.join(cleandir, cur_dir, cur_dir_file)
+                        if not dest_created and not dryrun:
+                            os.makedirs(dest_dir, exist_ok=True)
+                            dest_created = True
+                        file_to_move = file_entry.path
                         if not dryrun:
                             try:
-                                file_size = os.path.getsize(file_to_move)
+                                file_size = file_entry.stat().st_size
                                 move_with_increment_on_clash(file_to_move, os.path.join(dest_dir,cur_dir_file))
                                 have_cleaned = True
                                 total_size += file_size
@@ -1436,7 +1413,7 @@ def cmd_clean(cleandir, dryrun):
     else:
         info('nothing to clean. nice and tidy!')
 
-def cmd_verify(verifdir):
+def cmd_verify(verifdir, incremental=False, force_verify=False):
     """Verify integrity of downloaded game files against the manifest.
     
     Performs comprehensive validation of all game installers and extras in your
@@ -1458,15 +1435,22 @@ def cmd_verify(verifdir):
     3. ZIP integrity (Galaxy only): Can the ZIP be opened? Are executable bits set?
     4. MD5 checksum: Does the computed MD5 match the manifest?
     
-    MD5 computation is expensive, so the function uses a persistent cache
-    (MD5_DB) that stores checksums keyed by filename, size, and modification
-    time. If a file hasn't changed since the last verification, the cached
-    checksum is reused, dramatically speeding up subsequent verifications.
+    MD5 computation is expensive, so checksums are cached together with the
+    file's size and modification time: in an extended attribute on the file
+    itself (MD5_XATTR) where the filesystem supports it, so the cache survives
+    the library being moved or renamed, otherwise in a persistent cache
+    (MD5_DB) keyed by filename as well. If a file hasn't changed since the last
+    verification, the cached checksum is reused, dramatically speeding up
+    subsequent verifications.
     
     Args:
         verifdir: Root directory containing game folders to verify.
             Typically GAME_STORAGE_DIR/games. Each subdirectory should correspond
             to a game's folder_name in the manifest, containing the game's files.
+        incremental: If True, skip files that passed a previous incremental
+            verification and haven't changed since (default: False)
+        force_verify: If True, re-check every file even in incremental mode,
+            refreshing the verification marks (default: False)
     
     Verification behavior:
         - Skips games with no directory (not downloaded yet)
@@ -1491,6 +1475,14 @@ def cmd_verify(verifdir):
         - Cache persists across runs (shelve database)
         - Cache is automatically saved when verification completes
     
+    Incremental verification:
+        Only with incremental set. Files that pass are marked prev_verified in the
+        manifest, along with the size and mtime they had (last_verified_size,
+        last_verified_mtime). Unless force_verify is set, a file that is still
+        marked and has the same size and mtime is only stat'ed, not re-checked.
+        Failed or missing files lose the mark. Without incremental every file is
+        checked and the manifest is left alone.
+    
     Galaxy ZIP validation:
         GOG Galaxy installers are ZIP files that must preserve Unix file permissions
         (executable bits) for correct installation. This check detects ZIPs created
@@ -1520,8 +1512,9 @@ def cmd_verify(verifdir):
     Notes:
         - Only verifies files with MD5 checksums in manifest
         - Does not verify extras without MD5 (some GOG extras lack checksums)
-        - Does not modify any files or manifest
-        - Safe to run repeatedly - read-only operation
+        - Does not modify any files; the manifest is only saved to record
+          verification marks in incremental mode
+        - Safe to run repeatedly
         - Can be interrupted and rerun (cache persists)
         - Manifest must be up-to-date (run cmd_update first)
     
@@ -1552,90 +1545,75 @@ def cmd_verify(verifdir):
         error("no items found in manifest. run 'update' first.")
         return
 
-    hash_cache = shelve.open(MD5_DB, protocol=2)
+    hash_cache = BufferedShelf(shelve.open(MD5_DB, protocol=2))
+    hash_cache_lock = threading.Lock()
     completed_items = []
     invalid_items = []
+    manifest_changed = False
+    skip_verified = incremental and not force_verify
+    progress = None  # size weighted progress bar, when tqdm is installed
 
     info('')
     info('verifying game directories...')
-    for item in items:
-        try:
-            item_dir = os.path.join(verifdir, item.folder_name)
-        except AttributeError:
-            item_dir = os.path.join(verifdir, item.title)
-
-        if not os.path.isdir(item_dir):
-            continue
-
-        valid = True
-        for item_file in item.downloads + item.galaxyDownloads + item.sharedDownloads:
-            if not item_file.name:
-                continue
-
-            item_path = os.path.join(item_dir, item_file.name)
-
-            # check if it exists
-            if not os.path.isfile(item_path):
-                valid = False
-                invalid_items.append(item.title)
-                info('{} "{}": Missing'.format(item.title, item_file.name))
-                break  # missing files isn't going to get better
-
-            # check if it's the right size
-            if item_file.size and os.path.getsize(item_path) != int(item_file.size):
-                valid = False
-                invalid_items.append(item.title)
-                info('{} "{}": File size mismatch'.format(item.title, item_file.name))
-                break  # size mismatch isn't going to get better
-                
-            # check for executable bits for galaxy zips
-            if 'galaxy' in item_file.name.lower() and item_file.name.endswith('.zip'):
-                info('{}: Checking zip "{}"...'.format(item.title, item_file.name))
-                try:
-                    with zipfile.ZipFile(item_path, 'r') as myzip:
-                        infos = myzip.infolist()
-                        for zipinfo in infos:
-                            # extract external attr https://stackoverflow.com/questions/434641/
-                            unix_attr = zipinfo.external_attr >> 16
-                            if unix_attr == 0: # it wasn't set
-                                valid = False
-                                invalid_items.append(item.title)
-                                info('{} "{}": Detected zip file without the executable bit'.format(item.title, item_file.name))
-                                break
-                except Exception as e:
-                    valid = False
-                    invalid_items.append(item.title)
-                    info('{} "{}": Corrupt zip file? {}'.format(item.title, item_file.name, e))
-                    break
-
-            # check for the correct md5
-            # NB: computing md5 is expensive. we need a short-circuit sometimes
-            if item_file.md5:
-                try:
-                    item_file_cache_key = "{0}.{1}.{2}.md5".format(item_path, os.path.getsize(item_path), int(os.path.getmtime(item_path)))
-                    cached_hash = hash_cache.get(item_file_cache_key)
-                    if cached_hash:
-                        item_file_hash = cached_hash
-                    else:
-                        item_file_hash = hashfile(item_path)
-                        hash_cache[item_file_cache_key] = item_file_hash
-                except IOError as e:
-                    valid = False
-                    invalid_items.append(item.title)
-                    info('{} "{}": i/o error: {}'.format(item.title, item_file.name, e))
-                    break
-
-                if item_file.md5 != item_file_hash:
-                    valid = False
-                    invalid_items.append(item.title)
-                    info('{} "{}": MD5 mismatch'.format(item.title, item_file.name))
-                    break
+    # Files are checked (and hashed) by a pool of workers, results are reported per game in manifest order.
+    # On an interrupt the queued checks are cancelled, only the ones already running are waited for.
+    try:
+        with CancellingThreadPoolExecutor(max_workers=HASH_THREADS) as executor:
+            pending = []
+            for item in items:
+                item_dir = os.path.join(verifdir, item.folder_name)
 
-        if valid:
-            completed_items.append(item.title)
-            info('{}: OK!'.format(item.title))
+                if not os.path.isdir(item_dir):
+                    continue
 
-    hash_cache.close()
+                # largest files first within the game, the big installers cover most of its bytes
+                item_files = sorted((item_file for item_file in chain(item.downloads, item.galaxyDownloads, item.sharedDownloads)
+                                     if item_file.name), key=_file_size, reverse=True)
+                futures = [executor.submit(_verify_file, item, item_file, os.path.join(item_dir, item_file.name), hash_cache, hash_cache_lock, skip_verified)
+                           for item_file in item_files]
+                pending.append((item, item_files, futures))
+
+            if tqdm is not None:
+                progress = tqdm(total=sum(_file_size(item_file) for _, item_files, _ in pending for item_file in item_files),
+                                unit='B', unit_scale=True, unit_divisor=1024)
+            for item, item_files, futures in pending:
+                valid = True
+                checked = 0
+                for checked, (item_file, future) in enumerate(zip(item_files, futures), 1):
+                    messages, file_valid, stop, verified_st = future.result()
+                    if progress is not None:
+                        progress.update(_file_size(item_file))
+                    for message in messages:
+                        info(message)
+                    if incremental:
+                        if verified_st is not None:
+                            item_file.prev_verified = True
+                            item_file.last_verified_size = verified_st.st_size
+                            item_file.last_verified_mtime = int(verified_st.st_mtime)
+                            manifest_changed = True
+                        elif not file_valid and item_file.get('prev_verified'):
+                            item_file.prev_verified = False
+                            manifest_changed = True
+                    if not file_valid:
+                        valid = False
+                        invalid_items.append(item.title)
+                    if stop:
+                        break
+                # a game is only reported up to its first error, skip whatever hasn't run yet
+                for future in futures:
+                    future.cancel()
+                if progress is not None:
+                    progress.update(sum(_file_size(item_file) for item_file in item_files[checked:]))
+
+                if valid:
+                    completed_items.append(item.title)
+                    info('{}: OK!'.format(item.title))
+    finally:
+        if progress is not None:
+            progress.close()
+        hash_cache.close()
+    if manifest_changed:
+        save_manifest(items)
     info('')
     info("{0}/{1} items verified with no errors".format(len(completed_items), len(items)))
     if invalid_items:
@@ -1643,3 +1621,127 @@ def cmd_verify(verifdir):
         info("these {0} items have errors...".format(len(invalid_items)))
         for invalid_item in invalid_items:
             info('  {0}'.format(invalid_item))
+
+
+def _file_size(item_file):
+    """Manifest size of item_file in bytes, 0 if it isn't known."""
+    return int(item_file.get('size') or 0)
+
+def _verify_file(item, item_file, item_path, hash_cache, hash_cache_lock, skip_verified=False):
+    """Check a single manifest file on disk for cmd_verify.
+
+    With skip_verified, a file that passed an earlier incremental verify and still has
+    the size and mtime it had then isn't checked again.
+
+    Returns (messages, valid, stop, verified_st): the lines to report, whether the file
+    passed, whether the game's remaining files should be skipped and, if the file was
+    freshly checked and passed, the stat result it was checked against (else None).
+    """
+    messages = []
+    valid = True
+
+    # check if it exists
+    st = stat_file(item_path)
+    if st is None:
+        messages.append('{} "{}": Missing'.format(item.title, item_file.name))
+        return (messages, False, True, None)  # missing files isn't going to get better
+
+    # check if it's the right size
+    if item_file.size and st.st_size != int(item_file.size):
+        messages.append('{} "{}": File size mismatch'.format(item.title, item_file.name))
+        return (messages, False, True, None)  # size mismatch isn't going to get better
+
+    # passed before and untouched since
+    if (skip_verified and item_file.get('prev_verified')
+            and item_file.get('last_verified_size') == st.st_size
+            and item_file.get('last_verified_mtime') == int(st.st_mtime)):
+        return (messages, True, False, None)
+
+    # check for executable bits for galaxy zips
+    if item_file.name.endswith('.zip') and 'galaxy' in item_file.name.lower():
+        # a zip that passed before and hasn't changed since (same size and mtime) is not reopened
+        zip_cache_key = "{0}.{1}.{2}.zipok".format(item_path, st.st_size, int(st.st_mtime))
+        with hash_cache_lock:
+            zip_ok = hash_cache.get(zip_cache_key)
+        if not zip_ok:
+            messages.append('{}: Checking zip "{}"...'.format(item.title, item_file.name))
+            try:
+                with zipfile.ZipFile(item_path, 'r') as myzip:
+                    infos = myzip.infolist()
+                    for zipinfo in infos:
+                        # extract external attr https://stackoverflow.com/questions/434641/
+                        unix_attr = zipinfo.external_attr >> 16
+                        if unix_attr == 0: # it wasn't set
+                            valid = False
+                            messages.append('{} "{}": Detected zip file without the executable bit'.format(item.title, item_file.name))
+                            break
+            except Exception as e:
+                messages.append('{} "{}": Corrupt zip file? {}'.format(item.title, item_file.name, e))
+                return (messages, False, True, None)
+            if valid:
+                with hash_cache_lock:
+                    hash_cache[zip_cache_key] = True
+
+    # check for the correct md5
+    # NB: computing md5 is expensive. we need a short-circuit sometimes
+    if item_file.md5:
+        try:
+            item_file_hash = _cached_hashfile(item_path, st, hash_cache, hash_cache_lock)
+        except IOError as e:
+            messages.append('{} "{}": i/o error: {}'.format(item.title, item_file.name, e))
+            return (messages, False, True, None)
+
+        if item_file.md5 != item_file_hash:
+            messages.append('{} "{}": MD5 mismatch'.format(item.title, item_file.name))
+            return (messages, False, True, None)
+
+    return (messages, valid, False, st if valid else None)
+
+
+def _mark_imported(entry):
+    """Update the change/verification flags of a manifest entry whose file cmd_import
+    just put in place, filling in any that older manifests lack. Returns True if
+    anything was changed."""
+    changed = False
+    if entry.get('force_change', True):
+        entry.has_changed = False
+        changed = True
+    updated = entry.get('updated')
+    if 'updated' not in entry or 'old_updated' not in entry or entry.old_updated != updated:
+        entry.updated = updated
+        entry.old_updated = updated
+        changed = True
+    if not entry.get('prev_verified', False):
+        entry.prev_verified = True # This isn't guaranteed to actually be the file but anything that makes it this far will pass the verify check anyway
+        changed = True
+    return changed
+
+
+def _md5_cache_key(path, st):
+    """MD5_DB key for the hash of path as it was when st was taken."""
+    return "{0}.{1}.{2}.md5".format(path, st.st_size, int(st.st_mtime))
+
+
+def _cached_hashfile(path, st, hash_cache, hash_cache_lock, use_xattr=True):
+    """hashfile() through the md5 caches: the file's own xattr, then MD5_DB, both only
+    valid for the size and mtime from st. With use_xattr=False a new hash only goes
+    in MD5_DB, for files outside the library that shouldn't be written to."""
+    cached_hash = get_md5_xattr(path, st)
+    if cached_hash:
+        return cached_hash
+    with hash_cache_lock:  # shelve isn't thread safe
+        cached_hash = hash_cache.get(_md5_cache_key(path, st))
+    if cached_hash:
+        return cached_hash
+    file_hash = hashfile(path)
+    _store_hash(path, st, file_hash, hash_cache, hash_cache_lock, use_xattr)
+    return file_hash
+
+
+def _store_hash(path, st, file_hash, hash_cache, hash_cache_lock, use_xattr=True):
+    """Remember file_hash for path as it was when st was taken. It goes in an xattr on
+    the file where possible (and use_xattr is set), so it survives the library being
+    moved or renamed, and in MD5_DB otherwise."""
+    if not (use_xattr and set_md5_xattr(path, st, file_hash)):
+        with hash_cache_lock:
+            hash_cache[_md5_cache_key(path, st)] = file_hash
@@ -72,14 +72,15 @@ def list_users():
     
     # Check for named users in users/ directory
     users_dir = 'users'
-    if os.path.exists(users_dir):
-        for entry in os.listdir(users_dir):
-            user_path = os.path.join(users_dir, entry)
-            if os.path.isdir(user_path):
-                # Check if user has a token file
-                token_path = os.path.join(user_path, 'gog-token.dat')
-                if os.path.exists(token_path):
-                    users.append(entry)
+    try:
+        it = os.scandir(users_dir)
+    except OSError:
+        return users  # No users/ directory
+    with it:
+        for entry in it:
+            # Check if user has a token file (is_dir comes from the directory listing, no stat)
+            if entry.is_dir() and os.path.exists(os.path.join(entry.path, 'gog-token.dat')):
+                users.append(entry.name)
     
     return users
 
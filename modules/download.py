@@ -15,6 +15,7 @@ import platform
 import ctypes
 import ctypes.wintypes
 import requests
+from itertools import chain
 from queue import Queue
 
 from .utils import (
@@ -254,12 +255,13 @@ def filter_downloads_by_os_and_lang(downloads, os_list, lang_list):
     """
     # Filter by OS (only if os_list is provided)
     if os_list:
-        downloads = [item for item in downloads if item.os_type in os_list]
+        valid_os = frozenset(os_list)
+        downloads = [item for item in downloads if item.os_type in valid_os]
     
     # Filter by language (only if lang_list is provided)
     if lang_list:
         # Convert language codes to GOG API format
-        valid_langs = [LANG_TABLE[lang] for lang in lang_list]
+        valid_langs = frozenset(LANG_TABLE[lang] for lang in lang_list)
         # Filter by language
         downloads = [item for item in downloads if item.lang in valid_langs]
     
@@ -391,7 +393,7 @@ def clean_up_temp_directory(target_dir, all_items_by_title, dryrun, skip_subdir=
             # Directory is valid game folder, check its files
             expected_filenames = []
             game = all_items_by_title[cur_dir]
-            for game_item in game.downloads + game.galaxyDownloads + game.sharedDownloads + game.extras:
+            for game_item in chain(game.downloads, game.galaxyDownloads, game.sharedDownloads, game.extras):
                 expected_filenames.append(game_item.name)
                 
             for cur_dir_file in os.listdir(cur_fulldir):
@@ -926,7 +928,7 @@ def process_game_item_for_download(game_item, item_homedir, item_downloaddir, it
         This function is called for each game file in the download workflow:
         
         # Populate queue with all files to be downloaded
-        for game_item in filtered_downloads + filtered_galaxyDownloads + filtered_sharedDownloads + filtered_extras:
+        for game_item in chain(filtered_downloads, filtered_galaxyDownloads, filtered_sharedDownloads, filtered_extras):
             if game_item.name is None:
                 continue  # no game name, usually due to 404 during file fetch
             
@@ -967,20 +969,9 @@ def process_game_item_for_download(game_item, item_homedir, item_downloaddir, it
     Returns:
         bool: True if item was queued (download or provisional), False if skipped
     """
-    try:
-        _ = game_item.force_change
-    except AttributeError:
-        game_item.force_change = False
-        
-    try:
-        _ = game_item.updated
-    except AttributeError:
-        game_item.updated = None
-        
-    try:
-        _ = game_item.old_updated
-    except AttributeError:
-        game_item.old_updated = None
+    game_item.setdefault('force_change', False)
+    game_item.setdefault('updated', None)
+    game_item.setdefault('old_updated', None)
         
     skipfile_skip = check_skip_file(game_item.name, skipfiles)
     if skipfile_skip:
@@ -2920,7 +2911,7 @@ def _recover_provisional_leftover_files(items, provisionaldir, savedir):
                     file_md5 = None
                     
                     # Find the corresponding game item to get expected size and MD5
-                    for game_item in item.downloads + item.extras:
+                    for game_item in chain(item.downloads, item.extras):
                         if game_item.name == filename:
                             expected_size = game_item.size
                             try:
@@ -2987,10 +2978,7 @@ def cmd_download(savedir, skipextras,skipids, dryrun, ids,os_list, lang_list,ski
 
     # make convenient dict with title/dirname as key
     for item in all_items:
-        try:
-            _ = item.folder_name 
-        except AttributeError:
-            item.folder_name = item.title
+        item.setdefault('folder_name', item.title)
         all_items_by_title[item.folder_name] = item
         
 
@@ -3012,10 +3000,7 @@ def cmd_download(savedir, skipextras,skipids, dryrun, ids,os_list, lang_list,ski
                                         
         
     for item in items:
-        try:
-            _ = item.folder_name 
-        except AttributeError:
-            item.folder_name = item.title
+        item.setdefault('folder_name', item.title)
             
 
     # Find all items to be downloaded and push into work queue
@@ -3029,15 +3014,8 @@ def cmd_download(savedir, skipextras,skipids, dryrun, ids,os_list, lang_list,ski
             if not os.path.isdir(item_homedir):
                 os.makedirs(item_homedir)
                 
-        try:
-            _ = item.galaxyDownloads
-        except AttributeError:
-            item.galaxyDownloads = []
-            
-        try:
-            a = item.sharedDownloads
-        except AttributeError:
-            item.sharedDownloads = []
+        item.setdefault('galaxyDownloads', [])
+        item.setdefault('sharedDownloads', [])
 
         filtered_extras = item.extras
         filtered_downloads = item.downloads
@@ -3071,7 +3049,7 @@ def cmd_download(savedir, skipextras,skipids, dryrun, ids,os_list, lang_list,ski
             download_game_images(item, item_homedir, item_orphandir, backgrounds, covers, clean_old_images, downloadSession)
 
         # Populate queue with all files to be downloaded
-        for game_item in filtered_downloads + filtered_galaxyDownloads + filtered_sharedDownloads + filtered_extras:
+        for game_item in chain(filtered_downloads, filtered_galaxyDownloads, filtered_sharedDownloads, filtered_extras):
             if game_item.name is None:
                 continue  # no game name, usually due to 404 during file fetch
 
@@ -3272,22 +3250,10 @@ def cmd_download(savedir, skipextras,skipids, dryrun, ids,os_list, lang_list,ski
         info("moving provisionally completed download '%s' to '%s'  " % (provisional_path,path))
         shutil.move(provisional_path,path)
         if writable_game_item != None:
-            try:
-                _ = writable_game_item.force_change
-            except AttributeError:
-                writable_game_item.force_change = False
-            try:
-                _ = writable_game_item.updated
-            except AttributeError:
-                writable_game_item.updated = None
-            try:
-                _ = writable_game_item.old_updated
-            except AttributeError:
-                writable_game_item.old_updated = None
-            try:
-                _ = writable_game_item.prev_verified
-            except AttributeError:
-                writable_game_item.prev_verified = False
+            writable_game_item.setdefault('force_change', False)
+            writable_game_item.setdefault('updated', None)
+            writable_game_item.setdefault('old_updated', None)
+            writable_game_item.setdefault('prev_verified', False)
 
             
             if writable_game_item.force_change:
@@ -5,9 +5,10 @@ import os
 import json
 import time
 import datetime
-import copy
 import sys
 import pprint
+from itertools import chain
+from operator import attrgetter
 import requests
 
 from .utils import (
@@ -26,6 +27,7 @@ def load_manifest(filepath=MANIFEST_FILENAME, ignore_locks=False):
             with open(filepath, 'r', encoding='utf-8') as r:
                 ad = r.read().replace('{', 'AttrDict(**{').replace('}', '})')
             result = eval(ad)
+            upgrade_manifest_items(result)
             info('manifest loaded successfully with {} items'.format(len(result)))
             return result
         except Exception as e:
@@ -37,12 +39,36 @@ def load_manifest(filepath=MANIFEST_FILENAME, ignore_locks=False):
         info('manifest file not found at {}'.format(filepath))
         return []
 
+def upgrade_manifest_items(items):
+    """Fill in game and file attributes that manifests from older versions lack.
+    
+    Done once at load time so the commands can use the attributes directly.
+    """
+    for game in items:
+        if not hasattr(game, 'folder_name'):
+            game.folder_name = game.title
+        if not hasattr(game, 'galaxyDownloads'):
+            game.galaxyDownloads = []
+        if not hasattr(game, 'sharedDownloads'):
+            game.sharedDownloads = []
+        for game_item in chain(game.get('downloads', ()), game.galaxyDownloads, game.sharedDownloads, game.get('extras', ())):
+            game_item.setdefault('force_change', False)
+            game_item.setdefault('updated', None)
+            game_item.setdefault('old_updated', None)
+
+def _pprint_to_file(items, filepath, header=''):
+    """Writes items to filepath with pprint, through a temporary file that replaces
+    filepath once complete, so an interrupted save never leaves a truncated file."""
+    tmp_filepath = filepath + '.tmp'
+    with open(tmp_filepath, 'w', encoding='utf-8') as w:
+        w.write(header)
+        pprint.pprint(items, width=123, stream=w)
+    os.replace(tmp_filepath, filepath)
+
 def save_manifest(items, filepath=MANIFEST_FILENAME, update_md5_xml=False, delete_md5_xml=False):
     info('saving manifest...')
     try:
-        with open(filepath, 'w', encoding='utf-8') as w:
-            w.write('# GOGRepo Manifest %s\n' % datetime.date.today())
-            pprint.pprint(items, width=123, stream=w)
+        _pprint_to_file(items, filepath, '# GOGRepo Manifest %s\n' % datetime.date.today())
             
         if update_md5_xml:
             if not os.path.exists(MD5_DIR_NAME):
@@ -79,9 +105,7 @@ def save_manifest(items, filepath=MANIFEST_FILENAME, update_md5_xml=False, delet
         info('saved manifest')
     except KeyboardInterrupt:
         #If we ctrl-c whilst saving simply try again.
-        with open(filepath, 'w', encoding='utf-8') as w:
-            w.write('# GOGRepo Manifest %s\n' % datetime.date.today())
-            pprint.pprint(items, width=123, stream=w)
+        _pprint_to_file(items, filepath, '# GOGRepo Manifest %s\n' % datetime.date.today())
         info('saved manifest') 
         raise
 
@@ -100,12 +124,10 @@ def load_resume_manifest(filepath=RESUME_MANIFEST_FILENAME):
 def save_resume_manifest(items, filepath=RESUME_MANIFEST_FILENAME):
     info('saving resume manifest...')
     try:
-        with open(filepath, 'w', encoding='utf-8') as w:
-            pprint.pprint(items, width=123, stream=w)
-            info('saved resume manifest')
+        _pprint_to_file(items, filepath)
+        info('saved resume manifest')
     except KeyboardInterrupt:
-        with open(filepath, 'w', encoding='utf-8') as w:
-            pprint.pprint(items, width=123, stream=w)
+        _pprint_to_file(items, filepath)
         info('saved resume manifest')    
         raise
 
@@ -145,8 +167,10 @@ def deDuplicateList(duplicatedList, existingItems, strictDupe):
     deDuplicatedList = []
     for update_item in duplicatedList:
         if update_item.name is not None:                
-            dummy_item = copy.copy(update_item)
-            deDuplicatedName = deDuplicateName(dummy_item, existingItems, strictDupe)
+            # deDuplicateName only rewrites .name, so put it back rather than copying the entry
+            original_name = update_item.name
+            deDuplicatedName = deDuplicateName(update_item, existingItems, strictDupe)
+            update_item.name = original_name
             if deDuplicatedName is not None:
                 if (update_item.name != deDuplicatedName):
                     info('  -> ' + update_item.name + ' already exists in this game entry with a different size and/or md5, this file renamed to ' + deDuplicatedName)                        
@@ -158,22 +182,41 @@ def deDuplicateList(duplicatedList, existingItems, strictDupe):
             #Placeholder for an item coming soon, pass through
             deDuplicatedList.append(update_item)
     return deDuplicatedList        
+
+def registerDeDuplicatedList(deDuplicatedList, existingItems):
+    """Records the names of a list that is already free of clashes (the output of
+    deDuplicateList against an empty dict, or any subset of it) in existingItems, as
+    deDuplicateList would, without resolving each name again."""
+    for update_item in deDuplicatedList:
+        if update_item.name is not None:
+            existingItems[update_item.name] = {update_item.size: [update_item.md5]}
+    return deDuplicatedList
         
+# Hashable key for a download entry, fetched in one C-level call. Entries that compare equal always share a key.
+download_identity = attrgetter('href', 'name', 'size', 'md5')
+
+def index_downloads(downloads):
+    """Bucket download entries by download_identity() for fast membership tests."""
+    index = {}
+    for d in downloads:
+        index.setdefault(download_identity(d), []).append(d)
+    return index
+
+def in_download_index(d, index):
+    """Equivalent to ``d in downloads`` for the list that built ``index``."""
+    return any(d == other for other in index.get(download_identity(d), ()))
+
 def deDuplicateName(potentialItem, clashDict, strictDupe):
     try: 
         #Check if Name Exists
         existingDict = clashDict[potentialItem.name] 
         try:
             #Check if this md5 / size pair have already been resolved
-            prevItemsCount = 0
-            for key in existingDict:
-                prevItemsCount += len(existingDict[key]) 
+            prevItemsCount = sum(map(len, existingDict.values()))
             md5list = existingDict[potentialItem.size]
-            try:
-                idx = md5list.index(potentialItem.md5)
-            except ValueError:
+            if potentialItem.md5 not in md5list:
                 #Do this early, so we can abort early if need to rely on size match.
-                existingDict[potentialItem.size].append(potentialItem.md5) #Mark as resolved
+                md5list.append(potentialItem.md5) #Mark as resolved
                 if ((not strictDupe) and (None in md5list or potentialItem.md5 == None)):
                     return None
                 else:
@@ -220,27 +263,11 @@ def handle_game_renames(savedir, gamesdb, dryrun):
         os.makedirs(orphan_root_dir)
 
     for game in gamesdb:
-        try:
-            _ = game.galaxyDownloads
-        except AttributeError:
-            game.galaxyDownloads = []
-            
-        try:
-            a = game.sharedDownloads
-        except AttributeError:
-            game.sharedDownloads = []
-        try: 
-            _ = game.old_title 
-        except AttributeError:
-            game.old_title = None
-        try: 
-            _ = game.folder_name 
-        except AttributeError:
-            game.folder_name = game.title
-        try: 
-            _ = game.old_folder_name 
-        except AttributeError:
-            game.old_folder_name = game.old_title
+        game.setdefault('galaxyDownloads', [])
+        game.setdefault('sharedDownloads', [])
+        game.setdefault('old_title', None)
+        game.setdefault('folder_name', game.title)
+        game.setdefault('old_folder_name', game.old_title)
         if (game.old_folder_name is not None):
             src_dir = os.path.join(savedir, game.old_folder_name)
             dst_dir = os.path.join(savedir, game.folder_name)   
@@ -255,11 +282,8 @@ def handle_game_renames(savedir, gamesdb, dryrun):
                         move_with_increment_on_clash(src_dir,dst_dir)
                 except Exception: 
                     error('    -> rename failed "{}" -> "{}"'.format(game.old_folder_name, game.folder_name))
-        for item in game.downloads+game.galaxyDownloads+game.sharedDownloads+game.extras:
-            try: 
-                _ = item.old_name 
-            except AttributeError:
-                item.old_name = None
+        for item in chain(game.downloads, game.galaxyDownloads, game.sharedDownloads, game.extras):
+            item.setdefault('old_name', None)
         
             if (item.old_name is not None):            
                 game_dir =  os.path.join(savedir, game.folder_name)
@@ -285,23 +309,10 @@ def handle_game_renames(savedir, gamesdb, dryrun):
                             item.prev_verified = False
 
 def handle_game_updates(olditem, newitem,strict, update_downloads_strict, update_extras_strict):
-    try:
-        _ = olditem.galaxyDownloads
-    except AttributeError:
-        olditem.galaxyDownloads = []
-        
-    try:
-        a = olditem.sharedDownloads
-    except AttributeError:
-        olditem.sharedDownloads = []
-    try:
-        a = olditem.folder_name
-    except AttributeError:
-        olditem.folder_name = olditem.title
-    try:
-        a = newitem.folder_name
-    except AttributeError:
-        newitem.folder_name = newitem.title
+    olditem.setdefault('galaxyDownloads', [])
+    olditem.setdefault('sharedDownloads', [])
+    olditem.setdefault('folder_name', olditem.title)
+    newitem.setdefault('folder_name', newitem.title)
 
     if newitem.has_updates:
         info('  -> gog flagged this game as updated')
@@ -333,9 +344,10 @@ def handle_game_updates(olditem, newitem,strict, update_downloads_strict, update
             info('  -> serial key has changed')
                     
     #Done this way for backwards compatability. Would be faster to do each separately.     
-    for newDownload in newitem.downloads+newitem.galaxyDownloads+newitem.sharedDownloads:
+    oldDownloads = olditem.downloads+olditem.galaxyDownloads+olditem.sharedDownloads
+    for newDownload in chain(newitem.downloads, newitem.galaxyDownloads, newitem.sharedDownloads):
         candidate = None
-        for oldDownload in olditem.downloads+olditem.galaxyDownloads+olditem.sharedDownloads:
+        for oldDownload in oldDownloads:
             if oldDownload.md5 is not None:
                 if oldDownload.md5 == newDownload.md5 and oldDownload.size == newDownload.size and oldDownload.lang == newDownload.lang:
                     if oldDownload.name == newDownload.name:
@@ -352,10 +364,7 @@ def handle_game_updates(olditem, newitem,strict, update_downloads_strict, update
                         except AttributeError:
                             pass
         if candidate != None:
-            try: 
-                _ = candidate.unreleased
-            except AttributeError:
-                candidate.unreleased = False
+            candidate.setdefault('unreleased', False)
             try:
                 newDownload.prev_verified = candidate.prev_verified         
             except AttributeError:
@@ -423,10 +432,7 @@ def handle_game_updates(olditem, newitem,strict, update_downloads_strict, update
                         except AttributeError:
                             pass
         if candidate != None:
-            try: 
-                _ = candidate.unreleased
-            except AttributeError:
-                candidate.unreleased = False
+            candidate.setdefault('unreleased', False)
             try:
                 newExtra.prev_verified = candidate.prev_verified         
             except AttributeError:
@@ -482,9 +488,7 @@ def filter_downloads(out_list, downloads_list, lang_list, os_list,save_md5_xml,u
     downloads_dict = dict(downloads_list)
 
     # hold list of valid languages languages as known by gogapi json stuff
-    valid_langs = []
-    for lang in lang_list:
-        valid_langs.append(LANG_TABLE[lang])
+    valid_langs = frozenset(LANG_TABLE[lang] for lang in lang_list)
 
     # check if lang/os combo passes the specified filter
     for lang in downloads_dict:
@@ -525,13 +529,11 @@ def filter_downloads(out_list, downloads_list, lang_list, os_list,save_md5_xml,u
                                              old_force_change = None
                                              )
                                 for key in download:
-                                    try:
-                                        tmp_contents = d[key]
-                                        if tmp_contents != download[key]:
-                                            debug("GOG Data Key, %s , for download clashes with Download Data Key storing detailed info in secondary dict" % key)
-                                            d.gog_data[key] = download[key]
-                                    except Exception:
-                                        d[key] = download[key]             
+                                    if key not in d:
+                                        d[key] = download[key]
+                                    elif d[key] != download[key]:
+                                        debug("GOG Data Key, %s , for download clashes with Download Data Key storing detailed info in secondary dict" % key)
+                                        d.gog_data[key] = download[key]
                                 if d.gog_data.size == "0 MB":#Not Available
                                     warn("Unreleased File, Skipping Data Fetching %s" % d.desc)
                                     d.unreleased = True
@@ -607,13 +609,11 @@ def filter_extras(out_list, extras_list,save_md5_xml,updateSession):
                              old_force_change = None
                              )
                 for key in extra:
-                    try:
-                        tmp_contents = d[key]
-                        if tmp_contents != extra[key]:
-                            debug("GOG Data Key, %s , for extra clashes with Extra Data Key storing detailed info in secondary dict" % key)
-                            d.gog_data[key] = extra[key]
-                    except Exception:
+                    if key not in d:
                         d[key] = extra[key]
+                    elif d[key] != extra[key]:
+                        debug("GOG Data Key, %s , for extra clashes with Extra Data Key storing detailed info in secondary dict" % key)
+                        d.gog_data[key] = extra[key]
                 if d.gog_data.size == "0 MB":#Not Available
                     debug("Unreleased File, Skipping Data Fetching %s" % d.desc)
                     d.unreleased = True
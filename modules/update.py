@@ -18,14 +18,17 @@ All strategies use the game_filter module for consistent game selection logic.
 
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, groupby
 from dataclasses import dataclass
 from typing import Optional, List, Tuple
 
-from .utils import AttrDict, info, warn, error, debug, GOG_ACCOUNT_URL, GOG_MEDIA_TYPE_GAME, RESUME_MANIFEST_SYNTAX_VERSION, RESUME_SAVE_THRESHOLD, ORPHAN_DIR_NAME, log_exception
+from .utils import AttrDict, CancellingThreadPoolExecutor, bounded_map, info, warn, error, debug, response_json, decode_serial, HTTP_GAME_DOWNLOADER_THREADS, DETAIL_LIST_KEYS, GOG_ACCOUNT_URL, GOG_MEDIA_TYPE_GAME, RESUME_MANIFEST_SYNTAX_VERSION, RESUME_SAVE_THRESHOLD, ORPHAN_DIR_NAME, log_exception
 from .api import request
 from .manifest import (
-    filter_downloads, filter_extras, filter_dlcs, deDuplicateList,
-    load_resume_manifest, save_resume_manifest, save_manifest, item_checkdb,
+    filter_downloads, filter_extras, filter_dlcs, deDuplicateList, registerDeDuplicatedList,
+    index_downloads, in_download_index,
+    load_resume_manifest, save_resume_manifest, save_manifest,
     handle_game_updates, move_with_increment_on_clash
 )
 from .game_filter import (
@@ -120,29 +123,20 @@ def fetch_all_product_ids(session):
         - Sorts results by title
         - Skips hidden games if configured
     """
-    products = []
-    page = 0
     api_url = GOG_ACCOUNT_URL + "/getFilteredProducts"
     
-    while True:
-        page += 1
-        if page == 1:
-            info('fetching game product data (page %d)...' % page)
-        else:
-            info('fetching game product data (page %d / %d)...' % (page, json_data['totalPages']))
-        
-        response = request(session, api_url, args={
-            'mediaType': GOG_MEDIA_TYPE_GAME,
-            'sortBy': 'title',
-            'page': str(page)
-        })
-        
-        try:
-            json_data = response.json()
-        except ValueError:
-            error('failed to load product data (are you still logged in?)')
-            raise SystemExit(1)
-        
+    # The first page tells us how many there are, the rest are fetched concurrently
+    info('fetching game product data (page 1)...')
+    json_data = _fetch_product_page(session, api_url, 1)
+    total_pages = json_data['totalPages']
+    pages = [json_data]
+    if total_pages > 1:
+        with ThreadPoolExecutor(max_workers=HTTP_GAME_DOWNLOADER_THREADS) as executor:
+            pages.extend(executor.map(lambda page: _fetch_product_page(session, api_url, page, total_pages),
+                                      range(2, total_pages + 1)))
+    
+    products = []
+    for json_data in pages:
         # Parse each product in the page
         for item_json_data in json_data['products']:
             item = AttrDict()
@@ -164,31 +158,45 @@ def fetch_all_product_ids(session):
             item._id_mirror = item.id
             
             # Store extra GOG data
+            # Only keys already set above can clash, everything else is copied straight over
             item.gog_data = AttrDict()
-            for key in item_json_data:
-                try:
-                    tmp_contents = item[key]
-                    if tmp_contents != item_json_data[key]:
-                        debug("GOG Data Key, %s, for item clashes with Item Data Key storing detailed info in secondary dict" % key)
-                        item.gog_data[key] = item_json_data[key]
-                except Exception:
-                    item[key] = item_json_data[key]
+            for key in item.keys() & item_json_data.keys():
+                if item[key] != item_json_data[key]:
+                    debug("GOG Data Key, %s, for item clashes with Item Data Key storing detailed info in secondary dict" % key)
+                    item.gog_data[key] = item_json_data[key]
+            item.update((key, val) for key, val in item_json_data.items() if key not in item)
             
             products.append(item)
-        
-        # Check if we've reached the last page
-        if page >= json_data['totalPages']:
-            break
     
     return products
 
 
+def _fetch_product_page(session, api_url, page, total_pages=None):
+    """Fetch and decode one page of getFilteredProducts data."""
+    if total_pages is not None:
+        info('fetching game product data (page %d / %d)...' % (page, total_pages))
+    response = request(session, api_url, args={
+        'mediaType': GOG_MEDIA_TYPE_GAME,
+        'sortBy': 'title',
+        'page': str(page)
+    })
+    
+    try:
+        return response_json(response)
+    except ValueError:
+        error('failed to load product data (are you still logged in?)')
+        raise SystemExit(1)
+
+
 def fetch_and_merge_manifest(session, filtered_products, config):
     """Fetch detailed data for multiple games and merge with product metadata.
     
     This is a helper function used by all update strategies to avoid code duplication.
     Takes a filtered list of products and fetches detailed data for each one,
-    merging the product metadata with the detailed game data.
+    merging the product metadata with the detailed game data. Only the gameDetails
+    requests run on HTTP_GAME_DOWNLOADER_THREADS workers, at most two per worker
+    queued ahead, so they overlap; parsing and merging happen on the calling
+    thread in product order.
     
     Args:
         session: Authenticated GOG session object
@@ -200,22 +208,22 @@ def fetch_and_merge_manifest(session, filtered_products, config):
     """
     manifest = []
     
-    for i, product in enumerate(filtered_products, 1):
-        info("(%d / %d)" % (i, len(filtered_products)))
-        
-        game_data = fetch_and_parse_game_details(
-            session,
-            product.id,
-            product.title,
-            config
-        )
-        
-        if game_data:
-            # Merge product list data with detailed data
-            for key in product:
-                if key not in game_data:
-                    game_data[key] = product[key]
-            manifest.append(game_data)
+    # an interrupt cancels the fetches still queued instead of waiting for the whole list
+    with CancellingThreadPoolExecutor(max_workers=HTTP_GAME_DOWNLOADER_THREADS) as executor:
+        details = bounded_map(executor, lambda product: fetch_game_details_json(session, product.id, product.title),
+                              filtered_products, 2 * HTTP_GAME_DOWNLOADER_THREADS)
+        for i, (product, item_json_data) in enumerate(zip(filtered_products, details), 1):
+            game_data = None
+            if item_json_data is not None:
+                game_data = parse_game_details(session, product.id, product.title, item_json_data, config)
+            info("(%d / %d)" % (i, len(filtered_products)))
+            
+            if game_data:
+                # Merge product list data with detailed data
+                for key in product:
+                    if key not in game_data:
+                        game_data[key] = product[key]
+                manifest.append(game_data)
     
     info('successfully updated %d game(s)' % len(manifest))
     return manifest
@@ -245,22 +253,17 @@ def check_resume_needed(resumemode):
         resumeprops = resumedb.pop()
         needresume = resumemode != "noresume" and not resumeprops['complete']
         
-        try:
-            resume_manifest_syntax_version = resumeprops['resume_manifest_syntax_version']
-        except KeyError:
-            resume_manifest_syntax_version = -1
+        resume_manifest_syntax_version = resumeprops.get('resume_manifest_syntax_version', -1)
             
         if resume_manifest_syntax_version != RESUME_MANIFEST_SYNTAX_VERSION:
             warn('Incompatible Resume Manifest Version Detected.')
-            inp = None
-            
-            while inp not in ["D", "d", "A", "a"]:
-                inp = input("(D)iscard incompatible manifest or (A)bort? (D/d/A/a): ")
+            while True:
+                inp = input("(D)iscard incompatible manifest or (A)bort? (D/d/A/a): ").strip().lower()
                 
-                if inp in ["D", "d"]:
+                if inp == 'd':
                     warn("Discarding")
                     return (False, None, None)
-                elif inp in ["A", "a"]:
+                elif inp == 'a':
                     warn("Aborting")
                     sys.exit()
         
@@ -298,7 +301,7 @@ def create_resume_properties(config, skipknown, partial, updateonly):
     }
 
 
-def process_items_with_resume(items, gamesdb, game_filter, skipknown, updateonly):
+def process_items_with_resume(items, gamesdb, game_filter, skipknown, updateonly, resumeprop=None):
     """Process game items with periodic resume saves and strict update checking.
     
     This function handles the main update loop: processing each game item,
@@ -311,66 +314,63 @@ def process_items_with_resume(items, gamesdb, game_filter, skipknown, updateonly
         game_filter: GameFilter object with strict update flags
         skipknown: Whether in skipknown mode (affects save frequency)
         updateonly: Whether in updateonly mode (affects save frequency)
+        resumeprop: Resume properties dict, saved after the remaining items in
+            each resume manifest checkpoint (optional)
         
     Returns:
         Tuple of (updated_gamesdb, global_dupes)
-        - updated_gamesdb: Updated manifest with all processed games
+        - updated_gamesdb: Updated manifest with all processed games, sorted by title
         - global_dupes: List of games with duplicate titles (need _id suffix)
         
     Notes:
         - Saves manifest every RESUME_SAVE_THRESHOLD games
         - Saves more frequently in skipknown/updateonly modes
         - Handles exceptions gracefully, logging and continuing
-        - Updates resume manifest after each game
+        - Resume manifest (remaining items + resumeprop) is saved with the manifest
     """
-    # Create resume tracking
-    resumedb = sorted(items, key=lambda item: item.title)
+    # Create resume tracking, the unprocessed items are always sorted_items[i:]
+    sorted_items = sorted(items, key=lambda item: item.title)
+    resume_tail = [resumeprop] if resumeprop is not None else []
     items_count = len(items)
-    print_padding = len(str(items_count))
-    resumedbInitLength = len(resumedb)
+    progress_fmt = '(%%%dd / %d) processing %%s...' % (len(str(items_count)), items_count)
+    # id -> position in gamesdb, kept in step with the appends below
+    gamesdb_index = {game.id: idx for idx, game in enumerate(gamesdb)}
     i = 0
     
     # Process each item
-    for item in sorted(items, key=lambda item: item.title):
+    for item in sorted_items:
         i += 1
-        info("(%*d / %d) processing %s..." % (print_padding, i, items_count, item.title))
+        info(progress_fmt % (i, item.title))
         
         try:
             # Apply strict update checking if this game already exists
-            item_idx = item_checkdb(item.id, gamesdb)
+            item_idx = gamesdb_index.get(item.id)
             if item_idx is not None:
                 handle_game_updates(gamesdb[item_idx], item, game_filter.strict, 
                                    game_filter.strict, game_filter.strict)
                 gamesdb[item_idx] = item
             else:
+                gamesdb_index[item.id] = len(gamesdb)
                 gamesdb.append(item)
         except Exception:
             warn("The handled exception was:")
             log_exception('error')
             warn("End exception report.")
         
-        # Remove from resume list
-        resumedb.remove(item)
-        
         # Periodic save
-        if (updateonly or skipknown or 
-            (resumedbInitLength - len(resumedb)) % RESUME_SAVE_THRESHOLD == 0):
+        if updateonly or skipknown or i % RESUME_SAVE_THRESHOLD == 0:
             save_manifest(gamesdb)
-            save_resume_manifest(resumedb)
+            save_resume_manifest(sorted_items[i:] + resume_tail)
     
     # Handle duplicate titles (add _id suffix to folder_name)
+    # (games sharing a title are adjacent once sorted; sorted in place so the
+    # caller can save the manifest in this order without sorting it again)
     global_dupes = []
-    sorted_gamesdb = sorted(gamesdb, key=lambda game: game.title)
-    for game in sorted_gamesdb:
-        if game not in global_dupes:
-            index = sorted_gamesdb.index(game)
-            dupes = [game]
-            while (len(sorted_gamesdb) - 1 >= index + 1 and 
-                   sorted_gamesdb[index + 1].title == game.title):
-                dupes.append(sorted_gamesdb[index + 1])
-                index = index + 1
-            if len(dupes) > 1:
-                global_dupes.extend(dupes)
+    gamesdb.sort(key=lambda game: game.title)
+    for _, dupes in groupby(gamesdb, key=lambda game: game.title):
+        dupes = list(dupes)
+        if len(dupes) > 1:
+            global_dupes.extend(dupes)
     
     for dupe in global_dupes:
         dupe.folder_name = dupe.title + "_" + str(dupe.id)
@@ -385,6 +385,7 @@ def fetch_and_parse_game_details(session, game_id, game_title, config):
     
     Retrieves complete game information including downloads, extras, DLCs, serial
     keys, changelogs, etc. Applies content filtering based on OS/language preferences.
+    Same as fetch_game_details_json() followed by parse_game_details().
     
     Args:
         session: Authenticated GOG session object
@@ -394,21 +395,61 @@ def fetch_and_parse_game_details(session, game_id, game_title, config):
         
     Returns:
         AttrDict containing complete parsed game data ready for manifest, or None if fetch fails
+    """
+    item_json_data = fetch_game_details_json(session, game_id, game_title)
+    if item_json_data is None:
+        return None
+    return parse_game_details(session, game_id, game_title, item_json_data, config)
+
+
+def fetch_game_details_json(session, game_id, game_title):
+    """Fetch the gameDetails json for one game.
+    
+    Only does the request, so it is safe to run on worker threads.
+    
+    Args:
+        session: Authenticated GOG session object
+        game_id: Numeric game ID from GOG
+        game_title: Game title/slug for logging
         
-    Notes:
-        - Handles UTF-16 serial key decoding
-        - Filters downloads by OS/language
-        - Deduplicates download lists
-        - Categorizes downloads into standalone/galaxy/shared lists
+    Returns:
+        Decoded json dict, or None if the fetch fails
     """
-    api_url = GOG_ACCOUNT_URL + "/gameDetails/{}.json".format(game_id)
+    api_url = f"{GOG_ACCOUNT_URL}/gameDetails/{game_id}.json"
     
     info("fetching game details for %s..." % game_title)
     
     try:
         response = request(session, api_url)
-        item_json_data = response.json()
+        return response_json(response)
+    except Exception as e:
+        warn("Failed to fetch game details: %s" % str(e))
+        return None
+
+
+def parse_game_details(session, game_id, game_title, item_json_data, config):
+    """Parse gameDetails json into manifest format.
+    
+    Applies content filtering based on OS/language preferences; the session is
+    used for the md5 lookups of the downloads that are kept.
+    
+    Args:
+        session: Authenticated GOG session object
+        game_id: Numeric game ID from GOG
+        game_title: Game title/slug for logging
+        item_json_data: gameDetails json from fetch_game_details_json()
+        config: FetchConfig object containing download and filter settings
         
+    Returns:
+        AttrDict containing complete parsed game data ready for manifest, or None if parsing fails
+        
+    Notes:
+        - Handles UTF-16 serial key decoding
+        - Filters downloads by OS/language
+        - Deduplicates download lists
+        - Categorizes downloads into standalone/galaxy/shared lists
+    """
+    try:
         # Create game item from basic product info (would be passed in from fetch_all_product_ids)
         # For now, create minimal structure - in real integration, this would be passed in
         item = AttrDict()
@@ -419,22 +460,8 @@ def fetch_and_parse_game_details(session, game_id, game_title, config):
         # Parse detailed data
         item.bg_url = item_json_data['backgroundImage']
         item.bg_urls = AttrDict()
-        item.serial = item_json_data['cdKey']
-        
         # Handle UTF-16 encoded serial keys
-        if not item.serial.isprintable():
-            try:
-                pserial = item.serial
-                if len(pserial) % 2:  # Odd length
-                    pserial = pserial + "\x00"
-                pserial = bytes(pserial, "UTF-8")
-                pserial = pserial.decode("UTF-16")
-                if pserial.isprintable():
-                    item.serial = pserial
-                else:
-                    warn('Game serial code is unprintable, storing raw')
-            except Exception:
-                warn('Game serial code is unprintable and decoding failed, storing raw')
+        item.serial = decode_serial(item_json_data['cdKey'])
         
         item.serials = AttrDict()
         if item.serial != '':
@@ -461,14 +488,12 @@ def fetch_and_parse_game_details(session, game_id, game_title, config):
         # Store detailed GOG data
         item.detailed_gog_data = AttrDict()
         for key in item_json_data:
-            if key not in ["downloads", "extras", "galaxyDownloads", "dlcs"]:
-                try:
-                    tmp_contents = item[key]
-                    if tmp_contents != item_json_data[key]:
-                        debug("Detailed GOG Data Key, %s, for item clashes" % key)
-                        item.detailed_gog_data[key] = item_json_data[key]
-                except Exception:
+            if key not in DETAIL_LIST_KEYS:
+                if key not in item:
                     item[key] = item_json_data[key]
+                elif item[key] != item_json_data[key]:
+                    debug("Detailed GOG Data Key, %s, for item clashes" % key)
+                    item.detailed_gog_data[key] = item_json_data[key]
         
         # Filter downloads by OS/language
         filter_downloads(item.downloads, item_json_data['downloads'], config.lang_list, config.os_list, config.md5xmls, session)
@@ -481,22 +506,25 @@ def fetch_and_parse_game_details(session, game_id, game_title, config):
         item.galaxyDownloads = deDuplicateList(item.galaxyDownloads, {}, config.strict_dupe)
         
         # Identify shared downloads (in both standalone and galaxy)
-        item.sharedDownloads = [x for x in item.downloads if x in item.galaxyDownloads]
+        galaxy_index = index_downloads(item.galaxyDownloads)
+        item.sharedDownloads = [x for x in item.downloads if in_download_index(x, galaxy_index)]
+        shared_index = index_downloads(item.sharedDownloads)
         
         # Apply installer type filter
         if config.installers == 'galaxy':
             item.downloads = []
         else:
-            item.downloads = [x for x in item.downloads if x not in item.sharedDownloads]
+            item.downloads = [x for x in item.downloads if not in_download_index(x, shared_index)]
         
         if config.installers == 'standalone':
             item.galaxyDownloads = []
         else:
-            item.galaxyDownloads = [x for x in item.galaxyDownloads if x not in item.sharedDownloads]
+            item.galaxyDownloads = [x for x in item.galaxyDownloads if not in_download_index(x, shared_index)]
         
         # Final deduplication across all download types
+        # (downloads are already clash free from the first pass, so their names are just recorded)
         existing_items = {}
-        item.downloads = deDuplicateList(item.downloads, existing_items, config.strict_dupe)
+        registerDeDuplicatedList(item.downloads, existing_items)
         item.galaxyDownloads = deDuplicateList(item.galaxyDownloads, existing_items, config.strict_dupe)
         item.sharedDownloads = deDuplicateList(item.sharedDownloads, existing_items, config.strict_dupe)
         item.extras = deDuplicateList(item.extras, existing_items, config.strict_dupe)
@@ -504,7 +532,7 @@ def fetch_and_parse_game_details(session, game_id, game_title, config):
         return item
         
     except Exception as e:
-        warn("Failed to fetch game details: %s" % str(e))
+        warn("Failed to parse game details: %s" % str(e))
         return None
 
 
@@ -757,40 +785,13 @@ def handle_single_game_rename(game, savedir, orphan_root_dir, dryrun):
         dryrun: If True, only log what would be done without making changes
     """
     # Ensure game has all required attributes (defensive programming)
-    try:
-        _ = game.galaxyDownloads
-    except AttributeError:
-        game.galaxyDownloads = []
-        
-    try:
-        _ = game.sharedDownloads
-    except AttributeError:
-        game.sharedDownloads = []
-        
-    try:
-        _ = game.old_title
-    except AttributeError:
-        game.old_title = None
-        
-    try:
-        _ = game.folder_name
-    except AttributeError:
-        game.folder_name = game.title
-        
-    try:
-        _ = game.old_folder_name
-    except AttributeError:
-        game.old_folder_name = game.old_title
-    
-    try:
-        _ = game.downloads
-    except AttributeError:
-        game.downloads = []
-    
-    try:
-        _ = game.extras
-    except AttributeError:
-        game.extras = []
+    game.setdefault('galaxyDownloads', [])
+    game.setdefault('sharedDownloads', [])
+    game.setdefault('old_title', None)
+    game.setdefault('folder_name', game.title)
+    game.setdefault('old_folder_name', game.old_title)
+    game.setdefault('downloads', [])
+    game.setdefault('extras', [])
     
     # Handle game directory rename
     if game.old_folder_name is not None:
@@ -811,11 +812,8 @@ def handle_single_game_rename(game, savedir, orphan_root_dir, dryrun):
                 error('    -> rename failed "{}" -> "{}"'.format(game.old_folder_name, game.folder_name))
     
     # Handle file renames within the game directory
-    for item in game.downloads + game.galaxyDownloads + game.sharedDownloads + game.extras:
-        try:
-            _ = item.old_name
-        except AttributeError:
-            item.old_name = None
+    for item in chain(game.downloads, game.galaxyDownloads, game.sharedDownloads, game.extras):
+        item.setdefault('old_name', None)
         
         if item.old_name is not None:
             game_dir = os.path.join(savedir, game.folder_name)
@@ -11,9 +11,14 @@ import platform
 import ctypes
 import threading
 import contextlib
+import errno
 import time
 import shutil
+import stat
 import unicodedata
+from itertools import chain
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Optional imports
 try:
@@ -21,6 +26,21 @@ try:
 except ImportError:
     def html2text(x): return x
 
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 # Basic constants
 __appname__ = 'gogrepoc'
 __version__ = '0.3.4a-Gamma'
@@ -28,6 +48,9 @@ __author__  = 'Kalanyr'
 __licence__ = 'GPLv3'
 __url__     = 'http://github.com/Kalanyr/gogrepoc'
 
+# Linux ioctl that clones a file's extents on copy-on-write filesystems (btrfs, xfs)
+FICLONE = 0x40049409
+
 # Logging constants
 LOG_FILENAME = 'gogrepo.log'
 
@@ -36,6 +59,7 @@ HTTP_TIMEOUT = 300
 HTTP_RETRY_COUNT = 3
 HTTP_RETRY_DELAY = 3        # seconds
 HTTP_GAME_DOWNLOADER_THREADS = 4
+RESPONSE_CACHE_SIZE = 8192  # HEAD/md5 xml lookups remembered by api.cached_request
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/93.0.4577.82 Safari/537.36'
 
 # GOG API Constants
@@ -61,6 +85,7 @@ CONFIG_FILENAME = 'gogrepo.config'
 TOKEN_FILENAME = 'gog-token.dat'
 MD5_DIR_NAME = '!md5'
 MD5_DB = 'gog-md5.db'
+MD5_XATTR = 'user.gogrepo.md5'  # per-file md5 cache, travels with the file when it is moved or renamed
 DOWNLOADING_DIR_NAME = '!downloading'
 PROVISIONAL_DIR_NAME = '!provisional'
 ORPHAN_DIR_NAME = '!orphaned'
@@ -71,6 +96,9 @@ GAME_STORAGE_DIR = 'downloads'
 
 RESUME_MANIFEST_SYNTAX_VERSION = 1
 RESUME_SAVE_THRESHOLD = 50
+RESUME_SAVE_INTERVAL = 10  # seconds
+HASH_THREADS = min(4, os.cpu_count() or 1)  # files hashed in parallel by cmd_verify and cmd_import
+DELETE_THREADS = 4  # directory trees removed in parallel by cmd_trash and cmd_clear_partial_downloads
 
 # Lists
 VALID_OS_TYPES = ['windows', 'mac', 'linux']
@@ -88,11 +116,12 @@ LANG_TABLE = {
 
 VALID_LANG_TYPES = list(LANG_TABLE.keys())
 
-SKIP_MD5_FILE_EXT = ['.zip', '.exe', '.bin', '.dmg', '.sh', '.pkg', '.deb', '.tar.gz', '.pkg.tar.xz', '.rar', '.mp4']
-INSTALLERS_EXT = ['.exe', '.bin', '.dmg', '.pkg', '.sh']
-ORPHAN_DIR_EXCLUDE_LIST = ['!downloads'.lower(), '!downloading'.lower(), '!orphaned'.lower(), '!terraform'.lower(), '!md5'.lower()]
-ORPHAN_FILE_EXCLUDE_LIST = ['gogrepo.py', 'gogrepoc.py', 'gogrepo.config', 'pylru.py', 'pylru.pyc', 'gogrepo.log',
-                            'html2text.py', 'html2text.pyc', 'manifest.json', 'manifest.resume', 'token', 'token.json']
+SKIP_MD5_FILE_EXT = frozenset(['.zip', '.exe', '.bin', '.dmg', '.sh', '.pkg', '.deb', '.tar.gz', '.pkg.tar.xz', '.rar', '.mp4'])
+INSTALLERS_EXT = frozenset(['.exe', '.bin', '.dmg', '.pkg', '.sh'])
+DETAIL_LIST_KEYS = frozenset(['downloads', 'extras', 'galaxyDownloads', 'dlcs'])
+ORPHAN_DIR_EXCLUDE_LIST = frozenset(['!downloads'.lower(), '!downloading'.lower(), '!orphaned'.lower(), '!terraform'.lower(), '!md5'.lower()])
+ORPHAN_FILE_EXCLUDE_LIST = frozenset(['gogrepo.py', 'gogrepoc.py', 'gogrepo.config', 'pylru.py', 'pylru.pyc', 'gogrepo.log',
+                            'html2text.py', 'html2text.pyc', 'manifest.json', 'manifest.resume', 'token', 'token.json'])
 
 WINDOWS_PREALLOCATION_FS = ["NTFS"]
 POSIX_PREALLOCATION_FS = ["ext4", "btrfs", "xfs", "ocfs2", "gfs2", "tmpfs"]
@@ -176,6 +205,86 @@ class ConditionalWriter:
              with open(self.path, "w", encoding="utf-8") as f:
                    f.write(self.content)
 
+class BufferedShelf:
+    """
+    Wraps a shelf so stores are held in memory and written to it in batches of
+    flush_every (and on close), instead of one dbm write per assignment.
+    Not thread safe on its own, callers lock around it like they would a shelf.
+    """
+    def __init__(self, shelf, flush_every=500):
+        self.shelf = shelf
+        self.flush_every = flush_every
+        self.pending = {}
+
+    def get(self, key, default=None):
+        if key in self.pending:
+            return self.pending[key]
+        return self.shelf.get(key, default)
+
+    def __setitem__(self, key, value):
+        self.pending[key] = value
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.shelf.update(self.pending)
+            self.pending.clear()
+            self.shelf.sync()
+
+    def close(self):
+        self.flush()
+        self.shelf.close()
+
+class CancellingThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    A ThreadPoolExecutor that cancels its queued work when the with block is left
+    by an exception (e.g. Ctrl-C), so shutdown only waits for the tasks already
+    running instead of draining the whole queue. Same as cancel_futures=True on
+    Python 3.9+, which we can't rely on.
+    """
+    def __init__(self, *args, **kwargs):
+        super(CancellingThreadPoolExecutor, self).__init__(*args, **kwargs)
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    def submit(self, *args, **kwargs):
+        future = super(CancellingThreadPoolExecutor, self).submit(*args, **kwargs)
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future):
+        with self._pending_lock:
+            self._pending.discard(future)
+
+    def cancel_pending(self):
+        with self._pending_lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.cancel()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            self.cancel_pending()
+        return super(CancellingThreadPoolExecutor, self).__exit__(exc_type, exc_val, exc_tb)
+
+def bounded_map(executor, fn, iterable, window):
+    """
+    Like executor.map(fn, iterable), results in input order, but only window calls
+    are submitted ahead of the one being consumed, instead of the whole input up
+    front. Keeps an interrupt (and anything checkpointed meanwhile) close to where
+    the caller actually is.
+    """
+    pending = deque()
+    for arg in iterable:
+        pending.append(executor.submit(fn, arg))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
 class open_notrunc:
     """
     Opens a file for r+b but does not truncate it.
@@ -216,15 +325,50 @@ class open_notruncwrrd:
 
 def hashfile(file):
     """Calculates MD5 hash of a file."""
-    BLOCKSIZE = 65536
-    hasher = hashlib.md5()
-    with open(file, 'rb') as afile:
-        buf = afile.read(BLOCKSIZE)
-        while len(buf) > 0:
-            hasher.update(buf)
-            buf = afile.read(BLOCKSIZE)
+    BLOCKSIZE = 1024 * 1024
+    with open(file, 'rb', buffering=0) as afile:
+        if hasattr(os, 'posix_fadvise'):
+            # the whole file is read front to back once, let the kernel read ahead aggressively
+            try:
+                os.posix_fadvise(afile.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass # Only a hint, some filesystems don't take it
+        if hasattr(hashlib, 'file_digest'):  # Python 3.11+, reads straight into a reused buffer
+            return hashlib.file_digest(afile, 'md5').hexdigest()
+        # same thing by hand: one 1 MiB buffer reused for every read, no per-block bytes objects
+        hasher = hashlib.md5()
+        buf = bytearray(BLOCKSIZE)
+        view = memoryview(buf)
+        size = afile.readinto(buf)
+        while size:
+            hasher.update(view[:size])
+            size = afile.readinto(buf)
     return hasher.hexdigest()
 
+def get_md5_xattr(path, st):
+    """Returns the md5 that set_md5_xattr() stored on path, if it was taken at the size
+    and mtime in st, otherwise None."""
+    if not hasattr(os, 'getxattr'):
+        return None
+    try:
+        stamp, _, md5 = os.getxattr(path, MD5_XATTR).decode('ascii').partition(':')
+    except (OSError, UnicodeDecodeError):
+        return None # Not set, or no user xattrs on this filesystem
+    if stamp != "{0}.{1}".format(st.st_size, int(st.st_mtime)):
+        return None
+    return md5 or None
+
+def set_md5_xattr(path, st, md5):
+    """Stores md5 on path as a user xattr, stamped with the size and mtime in st. Setting
+    it doesn't touch the mtime. Returns False where xattrs aren't supported or allowed."""
+    if not hasattr(os, 'setxattr'):
+        return False
+    try:
+        os.setxattr(path, MD5_XATTR, "{0}.{1}:{2}".format(st.st_size, int(st.st_mtime), md5).encode('ascii'))
+    except OSError:
+        return False
+    return True
+
 def hashstream(stream, start, end):
     """Calculates MD5 hash of a stream segment."""
     BLOCKSIZE = 65536
@@ -274,6 +418,33 @@ def is_numeric_id(s):
     except ValueError:
         return False    
 
+def response_json(response):
+    """Decode a JSON response body, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+def decode_serial(serial):
+    """
+    Returns a game's cdKey as a readable string. GOG sometimes sends the UTF-16 bytes
+    of the key as if they were characters; those are mapped back to bytes one to one
+    (latin-1) and decoded. Anything that still isn't printable is returned as is.
+    """
+    if not serial or serial.isprintable():
+        return serial
+    try:
+        raw = serial.encode('latin-1')
+        if len(raw) % 2: #Odd
+            raw += b'\x00'
+        decoded = raw.decode('UTF-16')
+    except UnicodeError:
+        warn('Game serial code is unprintable and decoding failed, storing raw')
+        return serial
+    if not decoded.isprintable():
+        warn('Game serial code is unprintable, storing raw')
+        return serial
+    return decoded
+
 def append_xml_extension_to_url_path(url):
     from urllib.parse import urlparse, urlunparse
     parsed = urlparse(url)
@@ -290,17 +461,68 @@ def pretty_size(b):
     else:
         return '%.2fGB' % (b / 1024.0 / 1024.0 / 1024.0)
 
+def file_ext(name):
+    """Returns the lowercased last extension of name, including the dot ('' if none)."""
+    return os.path.splitext(name)[1].lower()
+
+def stat_file(path):
+    """Returns os.stat() of path if it is a regular file, otherwise None.
+    
+    One syscall in place of the isfile/getsize/getmtime trio."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return st
+
+def dir_file_sizes(path):
+    """Returns {name: size} for the regular files directly inside path.
+    
+    One os.scandir pass in place of a stat per file name; a missing or unreadable
+    directory gives an empty dict."""
+    sizes = {}
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        sizes[entry.name] = entry.stat().st_size
+                except OSError:
+                    pass # Ignore if file permission error or file removed
+    except OSError:
+        pass
+    return sizes
+
+def iter_files_with_size(path, skip_exts=()):
+    """Yields (filepath, size) for every file below path, recursively.
+    
+    Files whose (lowercased) last extension is in skip_exts are left out. Sizes come
+    from the os.scandir entries, so no separate getsize call is needed per file.
+    Unreadable directories are skipped, like os.walk does."""
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        return
+    subdirs = []
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file():
+                if file_ext(entry.name) not in skip_exts:
+                    yield (entry.path, entry.stat().st_size)
+        except OSError:
+            pass # Ignore if file permission error or file removed
+    for subdir in subdirs:
+        yield from iter_files_with_size(subdir, skip_exts)
+
 def get_total_size(path):
     """Calculates total size of a directory recursively."""
-    total_size = 0
-    for dirpath, dirnames, filenames in os.walk(path):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            try:
-                total_size += os.path.getsize(fp)
-            except OSError:
-                pass # Ignore if file permission error or file removed
-    return total_size
+    # sizes come from the scandir entries, rather than a getsize per file on top of os.walk's listing
+    return sum(size for _, size in iter_files_with_size(path))
 
 def get_fs_type(path, windows_magic=False):
     """
@@ -345,6 +567,37 @@ def test_zipfile(filepath):
     except NotImplementedError:
         raise # Compression not supported
 
+def fast_move(src, dest):
+    """
+    Moves src to dest, replacing dest if it exists. Same-filesystem moves are a single
+    rename, anything else falls back to shutil.move's copy and delete.
+    """
+    try:
+        os.replace(src, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dest)
+
+def fast_copy(src, dest):
+    """
+    Copies the contents of src to dest (a file path). On copy-on-write filesystems the
+    new file shares src's extents through a FICLONE reflink, anything else goes through
+    shutil.copyfile, which uses the kernel's in-place copy (sendfile) where it can.
+    Permission bits are copied either way, like shutil.copy.
+    """
+    cloned = False
+    if fcntl is not None and sys.platform.startswith('linux'):
+        with open(src, 'rb') as fsrc, open(dest, 'wb') as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                cloned = True
+            except OSError:
+                pass # Not supported here (other filesystem, different devices)
+    if not cloned:
+        shutil.copyfile(src, dest)
+    shutil.copymode(src, dest)
+
 def move_with_increment_on_clash(src, dest):
     """
     Moves a file or directory. If destination exists, appends incrementing number.
@@ -355,7 +608,7 @@ def move_with_increment_on_clash(src, dest):
     while os.path.exists(target):
          target = "{}_{}{}".format(base, i, ext)
          i += 1
-    shutil.move(src, target)
+    fast_move(src, target)
 
 def slugify(value, allow_unicode=False):
     """
@@ -564,27 +817,24 @@ def build_md5_lookup(gamesdb, game_filter):
             }
         }
     """
+    # Import should_process_game_by_id here to avoid circular imports
+    from .game_filter import should_process_game_by_id
+
     size_info = {}
     
-    valid_langs = []
-    for lang in game_filter.lang_list:
-        valid_langs.append(LANG_TABLE[lang])
+    valid_langs = frozenset(LANG_TABLE[lang] for lang in game_filter.lang_list)
+    valid_os = frozenset(game_filter.os_list)
+    # extras have more lenient lang/os requirements
+    valid_langs_extras = valid_langs | {u''}
+    valid_os_extras = valid_os | {u'extra'}
     
     for game in gamesdb:
         # Ensure required attributes exist
-        try:
-            _ = game.galaxyDownloads
-        except AttributeError:
+        if not hasattr(game, 'galaxyDownloads'):
             game.galaxyDownloads = []
-            
-        try:
-            _ = game.sharedDownloads
-        except AttributeError:
+        if not hasattr(game, 'sharedDownloads'):
             game.sharedDownloads = []
-
-        try:
-            _ = game.folder_name
-        except AttributeError:
+        if not hasattr(game, 'folder_name'):
             game.folder_name = game.title
 
         downloads = game.downloads
@@ -606,21 +856,17 @@ def build_md5_lookup(gamesdb, game_filter):
         if game_filter.skip_extras:
             extras = []
         
-        # Import should_process_game_by_id here to avoid circular imports
-        from .game_filter import should_process_game_by_id
         if not should_process_game_by_id(game, game_filter):
             continue
             
         # Process downloads (installers)
-        for game_item in downloads + galaxyDownloads + sharedDownloads:
+        for game_item in chain(downloads, galaxyDownloads, sharedDownloads):
             if game_item.md5 is not None:
                 if game_item.lang in valid_langs:
-                    if game_item.os_type in game_filter.os_list:
+                    if game_item.os_type in valid_os:
                         _add_to_md5_lookup(size_info, game_item, game.folder_name)
         
-        # Process extras (note: extras have more lenient lang/os requirements)
-        valid_langs_extras = valid_langs + [u'']
-        valid_os_extras = game_filter.os_list + [u'extra']
+        # Process extras
         for extra_item in extras:
             if extra_item.md5 is not None:
                 if extra_item.lang in valid_langs_extras:
@@ -638,21 +884,6 @@ def _add_to_md5_lookup(size_info, item, folder_name):
         item: The game item (download or extra) to add
         folder_name: The folder name for this game
     """
-    try:
-        md5_info = size_info[item.size]
-    except KeyError:
-        md5_info = {}
-    
-    try:
-        items = md5_info[item.md5]
-    except Exception:
-        items = {}
-    
-    try:
-        entry = items[(folder_name, item.name)]
-    except Exception:
-        entry = item
-    
-    items[(folder_name, item.name)] = entry
-    md5_info[item.md5] = items
-    size_info[item.size] = md5_info
+    items = size_info.setdefault(item.size, {}).setdefault(item.md5, {})
+    # the first entry registered for a (folder, name) pair wins
+    items.setdefault((folder_name, item.name), item)
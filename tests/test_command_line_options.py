@@ -415,52 +415,32 @@ class TestUpdateCommandOptions:
 class TestVerifyCommandOptions:
     """Test verify command specific options."""
     
-    def test_parse_skipmd5_flag(self):
-        """Test parsing -skipmd5 flag."""
+    def test_parse_incremental_flag(self):
+        """Test parsing -incremental flag, off by default."""
         from gogrepoc_new import process_argv
-        
-        test_args = ['gogrepoc.py', 'verify', '-skipmd5']
-        
-        with patch.object(sys, 'argv', test_args):
-            args = process_argv(test_args)
-            
-            # Should set skipmd5 flag
-            assert hasattr(args, 'skipmd5')
-            assert args.skipmd5 == True
-    
-    def test_parse_skipsize_flag(self):
-        """Test parsing -skipsize flag."""
-        from gogrepoc_new import process_argv
-        
-        test_args = ['gogrepoc.py', 'verify', '-skipsize']
-        
-        with patch.object(sys, 'argv', test_args):
-            args = process_argv(test_args)
-            
-            # Should set skipsize flag
-            assert hasattr(args, 'skipsize')
-            assert args.skipsize == True
-    
-    def test_parse_delete_flag(self):
-        """Test parsing -delete flag."""
-        from gogrepoc_new import process_argv
-        
-        test_args = ['gogrepoc.py', 'verify', '-delete']
-        
+
+        with patch.object(sys, 'argv', ['gogrepoc.py', 'verify']):
+            args = process_argv(['gogrepoc.py', 'verify'])
+            assert args.incremental == False
+
+        test_args = ['gogrepoc.py', 'verify', '-incremental', '-forceverify']
+
         with patch.object(sys, 'argv', test_args):
             args = process_argv(test_args)
-            
-            # Should set delete flag
-            assert hasattr(args, 'delete')
-            assert args.delete == True
-    
-    def test_mutually_exclusive_delete_noclean(self):
-        """Test that -delete and -noclean are mutually exclusive."""
+
+            # Should set both flags
+            assert args.incremental == True
+            assert args.forceverify == True
+
+    @pytest.mark.parametrize('option', [['-skipmd5'], ['-skipsize'], ['-skipzip'], ['-delete'], ['-noclean'],
+                                        ['-ids', 'foo'], ['-os', 'linux'], ['-skipfiles', '*.pdf'], ['-skipgalaxy']])
+    def test_rejects_unsupported_options(self, option):
+        """Test that options cmd_verify doesn't implement are refused, not ignored."""
         from gogrepoc_new import process_argv
         
-        test_args = ['gogrepoc.py', 'verify', '-delete', '-noclean']
+        test_args = ['gogrepoc.py', 'verify'] + option
         
         with patch.object(sys, 'argv', test_args):
-            # Should raise SystemExit due to mutually exclusive arguments
+            # Should raise SystemExit for the unrecognized argument
             with pytest.raises(SystemExit):
                 process_argv(test_args)
@@ -3,6 +3,7 @@ Integration tests comparing refactored vs original behavior.
 
 These tests ensure the refactored code produces identical results to the original.
 """
+import json
 import pytest
 import sys
 import os
@@ -32,6 +33,7 @@ class TestTokenRenewal:
             'refresh_token': 'new_refresh',
             'expires_in': 3600
         }
+        mock_response.content = json.dumps(mock_response.json.return_value).encode()
         mock_gog_session.get.return_value = mock_response
         
         # Should trigger renewal (expires within 300 seconds)
@@ -73,6 +75,7 @@ class TestTokenRenewal:
             'refresh_token': 'new_refresh',
             'expires_in': 3600
         }
+        mock_response.content = json.dumps(mock_response.json.return_value).encode()
         
         call_count = 0
         def mock_get(*args, **kwargs):
@@ -0,0 +1,121 @@
+"""
+Tests for download-list helpers in the manifest module.
+"""
+import pytest
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from modules.manifest import (download_identity, index_downloads, in_download_index, deDuplicateList, registerDeDuplicatedList,
+                              upgrade_manifest_items, save_resume_manifest, load_resume_manifest)
+from modules.utils import AttrDict
+
+
+def make_download(name, size=100, md5='abc', href=None, **extra):
+    d = AttrDict(name=name, size=size, md5=md5,
+                 href=href or 'https://www.gog.com/downloads/game/' + name)
+    d.update(extra)
+    return d
+
+
+class TestDownloadIndex:
+    """Test hashed membership checks for download lists."""
+
+    def test_equal_entries_share_identity(self):
+        a = make_download('setup.exe')
+        b = make_download('setup.exe')
+        assert a == b
+        assert download_identity(a) == download_identity(b)
+
+    def test_membership_matches_list_membership(self):
+        galaxy = [make_download('setup.exe'), make_download('patch.exe', md5='def')]
+        downloads = [make_download('setup.exe'), make_download('other.exe'), make_download('patch.exe', md5='zzz')]
+        index = index_downloads(galaxy)
+        assert [in_download_index(d, index) for d in downloads] == [d in galaxy for d in downloads]
+
+    def test_same_key_but_unequal_entry_is_not_member(self):
+        galaxy = [make_download('setup.exe', lang='English')]
+        candidate = make_download('setup.exe', lang='Deutsch')
+        index = index_downloads(galaxy)
+        assert not in_download_index(candidate, index)
+
+    def test_empty_index(self):
+        assert not in_download_index(make_download('setup.exe'), index_downloads([]))
+
+
+class TestDeDuplicateList:
+    """Test de-duplication of download names across a game's lists."""
+
+    def test_identical_entry_is_dropped(self):
+        existing = {}
+        first = deDuplicateList([make_download('setup.exe')], existing, True)
+        second = deDuplicateList([make_download('setup.exe')], existing, True)
+        assert len(first) == 1
+        assert second == []
+
+    def test_clashing_entry_is_renamed(self):
+        existing = {}
+        deDuplicateList([make_download('setup.exe')], existing, True)
+        clash = make_download('setup.exe', md5='def')
+        result = deDuplicateList([clash], existing, True)
+        assert result == [clash]
+        assert clash.name == 'setup(1).exe'
+
+    def test_dropped_entry_keeps_its_name(self):
+        existing = {}
+        deDuplicateList([make_download('setup.exe', md5=None)], existing, False)
+        dupe = make_download('setup.exe', md5='def')
+        assert deDuplicateList([dupe], existing, False) == []
+        assert dupe.name == 'setup.exe'
+
+    def test_registered_list_matches_deduplicated_list(self):
+        downloads = [make_download('setup.exe'), make_download('setup.exe', md5='def'), make_download('patch.exe')]
+        deduped = deDuplicateList(downloads, {}, True)
+        registered = {}
+        deduplicated = {}
+        assert registerDeDuplicatedList(deduped, registered) == deduped
+        deDuplicateList(deduped, deduplicated, True)
+        assert registered == deduplicated
+
+
+class TestUpgradeManifestItems:
+    """Test the load-time upgrade of old manifest entries."""
+
+    def test_fills_missing_attributes(self):
+        game = AttrDict(title='old_game', downloads=[], extras=[])
+        upgrade_manifest_items([game])
+        assert game.folder_name == 'old_game'
+        assert game.galaxyDownloads == []
+        assert game.sharedDownloads == []
+
+    def test_keeps_existing_attributes(self):
+        shared = [make_download('setup.exe')]
+        game = AttrDict(title='game', folder_name='game_123', galaxyDownloads=[], sharedDownloads=shared)
+        upgrade_manifest_items([game])
+        assert game.folder_name == 'game_123'
+        assert game.sharedDownloads is shared
+
+    def test_fills_missing_file_attributes(self):
+        download = make_download('setup.exe')
+        extra = make_download('manual.pdf')
+        extra.force_change = True
+        game = AttrDict(title='game', downloads=[download], extras=[extra])
+        upgrade_manifest_items([game])
+        assert download.force_change is False
+        assert download.updated is None and download.old_updated is None
+        assert extra.force_change is True
+
+
+class TestSaveResumeManifest:
+    """Test that resume manifests are replaced whole."""
+
+    def test_round_trips_and_leaves_no_temp_file(self, tmp_path):
+        path = str(tmp_path / 'resume.dat')
+        save_resume_manifest([AttrDict(id=1, title='old')], path)
+        save_resume_manifest([AttrDict(id=2, title='new'), {'complete': False}], path)
+        loaded = load_resume_manifest(path)
+        assert [item.get('id') for item in loaded] == [2, None]
+        assert loaded[-1]['complete'] is False
+        assert os.listdir(str(tmp_path)) == ['resume.dat']
@@ -4,8 +4,11 @@
 Tests for MD5 lookup dictionary building functionality.
 """
 
+import hashlib
+import os
 import pytest
-from modules.utils import build_md5_lookup, _add_to_md5_lookup, AttrDict
+from modules.utils import (build_md5_lookup, _add_to_md5_lookup, hashfile, iter_files_with_size, dir_file_sizes, AttrDict, BufferedShelf,
+                           get_md5_xattr, set_md5_xattr, fast_copy)
 from modules.game_filter import GameFilter
 
 
@@ -506,3 +509,156 @@ class TestBuildMd5Lookup:
         result = build_md5_lookup(gamesdb, game_filter)
         
         assert result == {}
+
+
+class TestHashfile:
+    """Test the hashfile MD5 helper."""
+    
+    def test_matches_md5_of_contents(self, tmp_path):
+        """Should return the hex MD5 of the whole file, across read blocks."""
+        data = bytes(range(256)) * 1000
+        path = tmp_path / 'setup.bin'
+        path.write_bytes(data)
+        
+        assert hashfile(str(path)) == hashlib.md5(data).hexdigest()
+    
+    def test_empty_file(self, tmp_path):
+        """Should hash an empty file."""
+        path = tmp_path / 'empty.bin'
+        path.write_bytes(b'')
+        
+        assert hashfile(str(path)) == hashlib.md5(b'').hexdigest()
+
+    def test_without_file_digest(self, tmp_path, monkeypatch):
+        """Should give the same MD5 through the read loop used before Python 3.11."""
+        monkeypatch.delattr(hashlib, 'file_digest', raising=False)
+        data = bytes(range(256)) * 5000
+        path = tmp_path / 'setup.bin'
+        path.write_bytes(data)
+
+        assert hashfile(str(path)) == hashlib.md5(data).hexdigest()
+
+
+class TestMd5Xattr:
+    """Test the md5 cache kept in a file's extended attributes."""
+    
+    def _set_or_skip(self, path, st, md5):
+        if not set_md5_xattr(str(path), st, md5):
+            pytest.skip('user xattrs not supported here')
+    
+    def test_roundtrip_while_unchanged(self, tmp_path):
+        """Should return the stored md5 while size and mtime still match."""
+        path = tmp_path / 'setup.exe'
+        path.write_bytes(b'abc')
+        st = os.stat(path)
+        self._set_or_skip(path, st, 'deadbeef')
+        
+        assert os.stat(path).st_mtime == st.st_mtime
+        assert get_md5_xattr(str(path), os.stat(path)) == 'deadbeef'
+    
+    def test_ignored_once_the_file_changes(self, tmp_path):
+        """Should not return an md5 stamped for a different size or mtime."""
+        path = tmp_path / 'setup.exe'
+        path.write_bytes(b'abc')
+        self._set_or_skip(path, os.stat(path), 'deadbeef')
+        path.write_bytes(b'abcd')
+        
+        assert get_md5_xattr(str(path), os.stat(path)) is None
+    
+    def test_missing_attribute(self, tmp_path):
+        """Should return None for a file without the attribute."""
+        path = tmp_path / 'setup.exe'
+        path.write_bytes(b'abc')
+        assert get_md5_xattr(str(path), os.stat(path)) is None
+
+
+class TestIterFilesWithSize:
+    """Test the recursive file listing used by import."""
+    
+    def test_lists_nested_files_with_sizes(self, tmp_path):
+        """Should yield every file below the root with its size."""
+        (tmp_path / 'game' / 'extras').mkdir(parents=True)
+        (tmp_path / 'game' / 'manual.pdf').write_bytes(b'x' * 10)
+        (tmp_path / 'game' / 'extras' / 'README').write_bytes(b'abc')
+        
+        found = dict(iter_files_with_size(str(tmp_path)))
+        
+        assert found == {
+            str(tmp_path / 'game' / 'manual.pdf'): 10,
+            str(tmp_path / 'game' / 'extras' / 'README'): 3,
+        }
+    
+    def test_skips_extensions_case_insensitively(self, tmp_path):
+        """Should leave out files whose extension is in skip_exts."""
+        (tmp_path / 'setup.EXE').write_bytes(b'x')
+        (tmp_path / 'soundtrack.mp3').write_bytes(b'x')
+        
+        found = [path for path, _ in iter_files_with_size(str(tmp_path), frozenset(['.exe']))]
+        
+        assert found == [str(tmp_path / 'soundtrack.mp3')]
+    
+    def test_missing_directory(self, tmp_path):
+        """Should yield nothing for a directory that doesn't exist."""
+        assert list(iter_files_with_size(str(tmp_path / 'missing'))) == []
+
+
+class TestDirFileSizes:
+    """Test the single directory listing used by backup."""
+    
+    def test_lists_files_but_not_subdirectories(self, tmp_path):
+        """Should map each file directly inside the directory to its size."""
+        (tmp_path / 'extras').mkdir()
+        (tmp_path / 'setup.exe').write_bytes(b'x' * 5)
+        (tmp_path / 'extras' / 'manual.pdf').write_bytes(b'x')
+        
+        assert dir_file_sizes(str(tmp_path)) == {'setup.exe': 5}
+    
+    def test_missing_directory(self, tmp_path):
+        """Should return an empty dict for a directory that doesn't exist."""
+        assert dir_file_sizes(str(tmp_path / 'missing')) == {}
+
+
+class TestFastCopy:
+    """Test the copy used by import."""
+    
+    def test_copies_contents_and_permission_bits(self, tmp_path):
+        """Should copy the data and keep the source's mode, e.g. an installer's executable bit."""
+        src = tmp_path / 'setup.sh'
+        src.write_bytes(b'#!/bin/sh\n')
+        os.chmod(src, 0o755)
+        dest = tmp_path / 'copy.sh'
+        
+        fast_copy(str(src), str(dest))
+        
+        assert dest.read_bytes() == b'#!/bin/sh\n'
+        assert os.stat(dest).st_mode & 0o777 == 0o755
+
+
+class TestBufferedShelf:
+    """Test the batching wrapper around the MD5 cache shelf."""
+    
+    def test_pending_values_are_readable_before_flush(self):
+        """Should serve stored values before they reach the shelf."""
+        shelf = {}
+        cache = BufferedShelf(shelf, flush_every=10)
+        
+        cache['a.md5'] = 'abc'
+        
+        assert cache.get('a.md5') == 'abc'
+        assert shelf == {}
+    
+    def test_flushes_in_batches_and_on_close(self, tmp_path):
+        """Should write to the shelf once flush_every values are pending, and on close."""
+        import shelve
+        shelf = shelve.open(str(tmp_path / 'md5.db'), protocol=2)
+        cache = BufferedShelf(shelf, flush_every=2)
+        
+        cache['a'] = 1
+        cache['b'] = 2
+        assert shelf.get('b') == 2
+        cache['c'] = 3
+        assert shelf.get('c') is None
+        cache.close()
+        
+        with shelve.open(str(tmp_path / 'md5.db')) as reopened:
+            assert dict(reopened) == {'a': 1, 'b': 2, 'c': 3}
@@ -4,6 +4,7 @@ Tests for update strategy functions.
 Tests the update module which provides functions to fetch game data
 from GOG API and update the local manifest using different strategies.
 """
+import json
 import pytest
 import sys
 import os
@@ -27,7 +28,7 @@ from modules.update import (
     process_items_with_resume,
     handle_single_game_rename
 )
-from modules.utils import AttrDict
+from modules.utils import AttrDict, bounded_map
 from modules.game_filter import GameFilter
 
 
@@ -160,6 +161,7 @@ class TestFetchAllProductIds:
         """Should fetch all products from single page."""
         mock_response = Mock()
         mock_response.json.return_value = sample_product_data
+        mock_response.content = json.dumps(sample_product_data).encode()
         mock_session.return_value = mock_response
         
         with patch('modules.update.request', return_value=mock_response):
@@ -191,8 +193,10 @@ class TestFetchAllProductIds:
         
         mock_response1 = Mock()
         mock_response1.json.return_value = page1_data
+        mock_response1.content = json.dumps(page1_data).encode()
         mock_response2 = Mock()
         mock_response2.json.return_value = page2_data
+        mock_response2.content = json.dumps(page2_data).encode()
         
         with patch('modules.update.request', side_effect=[mock_response1, mock_response2]):
             products = fetch_all_product_ids(mock_session)
@@ -205,6 +209,7 @@ class TestFetchAllProductIds:
         """Should correctly parse has_updates flag."""
         mock_response = Mock()
         mock_response.json.return_value = sample_product_data
+        mock_response.content = json.dumps(sample_product_data).encode()
         
         with patch('modules.update.request', return_value=mock_response):
             products = fetch_all_product_ids(mock_session)
@@ -222,6 +227,7 @@ class TestFetchAndParseGameDetails:
         """Should fetch and parse game details successfully."""
         mock_response = Mock()
         mock_response.json.return_value = sample_game_details
+        mock_response.content = json.dumps(sample_game_details).encode()
         
         with patch('modules.update.request', return_value=mock_response):
             with patch('modules.update.filter_downloads'):
@@ -243,6 +249,7 @@ class TestFetchAndParseGameDetails:
         config = FetchConfig(no_changelogs=True)
         mock_response = Mock()
         mock_response.json.return_value = sample_game_details
+        mock_response.content = json.dumps(sample_game_details).encode()
         
         with patch('modules.update.request', return_value=mock_response):
             with patch('modules.update.filter_downloads'):
@@ -255,6 +262,26 @@ class TestFetchAndParseGameDetails:
         
         assert game_data.changelog == ''
     
+    def test_decodes_utf16_serial(self, mock_session, sample_game_details, basic_config):
+        """Should decode a serial that GOG sent as raw UTF-16 bytes."""
+        details = dict(sample_game_details)
+        details['cdKey'] = 'ABCD-1234'.encode('utf-16-le').decode('latin-1')
+        mock_response = Mock()
+        mock_response.json.return_value = details
+        mock_response.content = json.dumps(details).encode()
+        
+        with patch('modules.update.request', return_value=mock_response):
+            with patch('modules.update.filter_downloads'):
+                with patch('modules.update.filter_extras'):
+                    with patch('modules.update.filter_dlcs'):
+                        with patch('modules.update.deDuplicateList', side_effect=lambda x, y, z: x):
+                            game_data = fetch_and_parse_game_details(
+                                mock_session, 1234567, 'witcher_3', basic_config
+                            )
+        
+        assert game_data.serial == 'ABCD-1234'
+        assert game_data.serials == {game_data.long_title: 'ABCD-1234'}
+    
     def test_handles_fetch_failure(self, mock_session, basic_config):
         """Should return None on fetch failure."""
         with patch('modules.update.request', side_effect=Exception('API Error')):
@@ -265,6 +292,28 @@ class TestFetchAndParseGameDetails:
         assert game_data is None
 
 
+class TestBoundedMap:
+    """Test the windowed executor.map used for the gameDetails fetches."""
+    
+    def test_results_in_input_order(self):
+        """Should return fn's results in the order of the input."""
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            assert list(bounded_map(executor, lambda x: x * 2, range(10), 2)) == [x * 2 for x in range(10)]
+    
+    def test_submits_at_most_window_ahead(self):
+        """Should not submit more than window calls ahead of the consumer."""
+        from concurrent.futures import ThreadPoolExecutor
+        submitted = []
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = bounded_map(executor, lambda x: x, (submitted.append(x) or x for x in range(10)), 3)
+            assert next(results) == 0
+            assert len(submitted) == 3
+            assert next(results) == 1
+            assert len(submitted) == 4
+            assert list(results) == list(range(2, 10))
+
+
 class TestFetchAndMergeManifest:
     """Test the fetch_and_merge_manifest helper function."""
     
@@ -276,12 +325,13 @@ class TestFetchAndMergeManifest:
             AttrDict({'id': 2, 'title': 'game2', 'has_updates': False, 'genre': 'Action'})
         ]
         
-        # Mock fetch_and_parse_game_details to return partial data
-        def mock_fetch_details(session, game_id, title, config):
+        # Mock the fetch and parse steps to return partial data
+        def mock_parse_details(session, game_id, title, item_json_data, config):
             return AttrDict({'id': game_id, 'title': title, 'downloads': []})
         
-        with patch('modules.update.fetch_and_parse_game_details', side_effect=mock_fetch_details):
-            manifest = fetch_and_merge_manifest(mock_session, products, basic_config)
+        with patch('modules.update.fetch_game_details_json', return_value={}):
+            with patch('modules.update.parse_game_details', side_effect=mock_parse_details):
+                manifest = fetch_and_merge_manifest(mock_session, products, basic_config)
         
         assert len(manifest) == 2
         # Should have both product data (genre) and detail data (downloads)
@@ -297,13 +347,20 @@ class TestFetchAndMergeManifest:
         ]
         
         # First fetch succeeds, second fails
-        def mock_fetch_details(session, game_id, title, config):
+        def mock_fetch_json(session, game_id, title):
             if game_id == 1:
-                return AttrDict({'id': game_id, 'title': title})
+                return {}
             return None
         
-        with patch('modules.update.fetch_and_parse_game_details', side_effect=mock_fetch_details):
-            manifest = fetch_and_merge_manifest(mock_session, products, basic_config)
+        def mock_parse_details(session, game_id, title, item_json_data, config):
+            return AttrDict({'id': game_id, 'title': title})
+        
+        with patch('modules.update.fetch_game_details_json', side_effect=mock_fetch_json):
+            with patch('modules.update.parse_game_details', side_effect=mock_parse_details) as mock_parse:
+                manifest = fetch_and_merge_manifest(mock_session, products, basic_config)
+        
+        # The failed fetch is never parsed
+        assert mock_parse.call_count == 1
         
         # Only successful fetch should be in manifest
         assert len(manifest) == 1
@@ -712,29 +769,27 @@ class TestProcessItemsWithResume:
     def test_handles_exceptions_gracefully(self):
         """Should log exceptions and continue processing."""
         items = [
-            AttrDict({'id': 1, 'title': 'game1'}),
+            AttrDict({'id': 1, 'title': 'game1', 'version': '2.0'}),
             AttrDict({'id': 2, 'title': 'game2'})
         ]
-        gamesdb = []
-        
-        # Make first item raise exception
-        def side_effect(item_id, db):
-            if item_id == 1:
-                raise ValueError("Test error")
-            return None
+        gamesdb = [
+            AttrDict({'id': 1, 'title': 'game1', 'version': '1.0'})
+        ]
         
+        # Make the update of the first (existing) item raise exception
         with patch('modules.update.save_manifest'):
             with patch('modules.update.save_resume_manifest'):
-                with patch('modules.update.item_checkdb', side_effect=side_effect):
+                with patch('modules.update.handle_game_updates', side_effect=ValueError("Test error")):
                     with patch('modules.update.RESUME_SAVE_THRESHOLD', 10):
                         game_filter = GameFilter()
                         updated_db, dupes = process_items_with_resume(
                             items, gamesdb, game_filter, False, False
                         )
         
-        # Should still have processed second item
-        assert len(updated_db) == 1
-        assert updated_db[0].id == 2
+        # Failed item keeps its old entry, second item still processed
+        assert len(updated_db) == 2
+        assert updated_db[0].version == '1.0'
+        assert updated_db[1].id == 2
     
     def test_detects_duplicate_titles(self):
         """Should detect games with duplicate titles."""